@@ -1,95 +1,470 @@
+from collections import OrderedDict
+
 import numpy as np
 import matplotlib.pyplot as plt
+import matplotlib.image as mpimg
+
+# 生成元（motif）表：单位线段 [0, 1] 上的复数点序列，首点为0，末点为1。
+# 每一层把每条线段替换为按该线段缩放、旋转后的生成元。
+KOCH_MOTIF = np.array([0, 1/3, 1/3 + np.exp(1j*np.pi/3)/3, 2/3, 1])
+MINKOWSKI_MOTIF = np.array([0, 0.25, 0.25 + 0.25j, 0.5 + 0.25j, 0.5,
+                            0.5 - 0.25j, 0.75 - 0.25j, 0.75, 1])
+LEVY_C_MOTIF = np.array([0, 0.5 + 0.5j, 1])
+QUADRATIC_KOCH_MOTIF = np.array([0, 1/3, 1/3 + 1j/3, 2/3 + 1j/3, 2/3, 1])
+
+# minkowski_generator 原有实现在 0.5+0.25j 处重复输出一次（p4 与 p5 重合），
+# 为保持其输出不变，这里保留该10点版本
+_MINKOWSKI_GENERATOR_POINTS = np.insert(MINKOWSKI_MOTIF, 4, MINKOWSKI_MOTIF[3])
+
+def _normalize_motif(motif, dtype=np.complex128):
+    """
+    将生成元归一化为首点0、末点1的复数数组（在 complex128 下归一化后转换为 dtype）。
+    """
+    if np.dtype(dtype).kind != 'c':
+        raise ValueError(f"dtype 必须是复数类型，而不是 {np.dtype(dtype)}")
+    motif = np.asarray(motif, dtype=np.complex128)
+    if len(motif) < 2:
+        raise ValueError("生成元至少需要2个点")
+    span = motif[-1] - motif[0]
+    if span == 0:
+        raise ValueError("生成元首末点不能重合")
+    return ((motif - motif[0]) / span).astype(dtype)
+
+def _subdivide(u, motif, duplicate_joints=False):
+    """
+    对点序列 u 的所有线段一次性应用生成元（线段 × 生成元的外积展开）。
+    
+    参数:
+        u: 点序列（复数数组），输出与之同类型
+        motif: 归一化的生成元（与 u 同类型）
+        duplicate_joints: 为True时每条线段输出生成元的全部点（相邻线段的
+            公共端点重复出现）；否则相邻线段共享端点
+    
+    返回:
+        numpy.ndarray: 下一层的点序列
+    """
+    start = u[:-1]
+    span = u[1:] - start
+    n = len(span)
+    k = len(motif)
+    if duplicate_joints:
+        new_u = np.empty(n*k, dtype=u.dtype)
+        block = new_u.reshape(n, k)
+        np.multiply(span[:, None], motif[None, :], out=block)
+    else:
+        new_u = np.empty(n*(k-1) + 1, dtype=u.dtype)
+        block = new_u[:-1].reshape(n, k-1)
+        np.multiply(span[:, None], motif[None, :-1], out=block)
+        new_u[-1] = u[-1]
+    block += start[:, None]
+    return new_u
+
+def similarity_curve(initiator, motif, level, duplicate_joints=False, dtype=np.complex128):
+    """
+    用生成元表迭代生成相似性分形曲线。
+    
+    参数:
+        initiator: 初始折线的点序列（复数表示）
+        motif: 生成元，单位线段上的复数点序列（会自动归一化到首点0、末点1）
+        level: 迭代层数
+        duplicate_joints: 是否在每条线段的输出中重复公共端点
+            （koch_generator/minkowski_generator 的输出格式）
+        dtype: 点的复数类型；np.complex64 可使内存减半，精度损失见 dtype_deviation
+    
+    返回:
+        numpy.ndarray: 生成的所有点（复数数组）。共享端点时，m 条初始线段、
+        k 点生成元在第 level 层共有 m*(k-1)**level + 1 个点
+    """
+    u = np.asarray(initiator, dtype=dtype)
+    motif = _normalize_motif(motif, dtype)
+    for _ in range(level):
+        u = _subdivide(u, motif, duplicate_joints)
+    return u
+
+def _subdivide_stream(chunks, motif, duplicate_joints, max_segments):
+    """
+    对按顺序给出的点块流逐块细分一层，相邻块之间的线段通过携带上一块的末点补齐。
+    每次最多细分 max_segments 条线段，保证输出块大小有界。
+    """
+    last = None
+    for chunk in chunks:
+        if last is not None:
+            chunk = np.concatenate(([last], chunk))
+        for i in range(0, len(chunk) - 1, max_segments):
+            new_u = _subdivide(chunk[i:i + max_segments + 1], motif, duplicate_joints)
+            # 共享端点时，块的末点由下一块（或最后单独）输出
+            yield new_u if duplicate_joints else new_u[:-1]
+        if len(chunk):
+            last = chunk[-1]
+    if not duplicate_joints and last is not None:
+        yield np.array([last])
+
+def _rechunk(pieces, chunk_size):
+    """
+    把大小不一的点块流重新切分为固定大小 chunk_size 的块（最后一块可能较小）。
+    """
+    buf = []
+    count = 0
+    for piece in pieces:
+        buf.append(piece)
+        count += len(piece)
+        while count >= chunk_size:
+            joined = np.concatenate(buf)
+            yield joined[:chunk_size]
+            buf = [joined[chunk_size:]]
+            count -= chunk_size
+    if count:
+        yield np.concatenate(buf)
+
+def iter_similarity_curve(initiator, motif, level, chunk_size=1 << 16, duplicate_joints=False,
+                          dtype=np.complex128):
+    """
+    按曲线顺序分块生成相似性分形曲线的点，内存占用与总点数无关。
+    
+    每一层是一个生成器，逐块细分上一层的输出（深度优先展开），
+    同时驻留的只有每层各一块数据，内存约为 O(level * chunk_size)。
+    
+    参数:
+        initiator: 初始折线的点序列（复数表示）
+        motif: 生成元，单位线段上的复数点序列
+        level: 迭代层数
+        chunk_size: 每块的点数
+        duplicate_joints: 是否在每条线段的输出中重复公共端点
+        dtype: 点的复数类型
+    
+    返回:
+        generator: 依次产生复数数组块，拼接后与 similarity_curve 的结果相同
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size 必须为正整数")
+    motif = _normalize_motif(motif, dtype)
+    max_segments = max(1, chunk_size // len(motif))
+    stream = iter([np.asarray(initiator, dtype=dtype)])
+    for _ in range(level):
+        stream = _subdivide_stream(stream, motif, duplicate_joints, max_segments)
+    return _rechunk(stream, chunk_size)
+
+def as_xy(points):
+    """
+    把复数点数组视为交错存放的 (x, y) 实数数组，不复制数据。
+    complex64 对应 float32，complex128 对应 float64。
+    
+    参数:
+        points: 点序列（复数数组）
+    
+    返回:
+        numpy.ndarray: 形状为 (N, 2) 的实数数组视图
+    """
+    points = np.ascontiguousarray(points)
+    return points.view(points.real.dtype).reshape(-1, 2)
+
+def dtype_deviation(initiator, motif, level, dtype=np.complex64, duplicate_joints=False):
+    """
+    统计用低精度 dtype 生成曲线时相对 complex128 结果的最大偏差。
+    
+    参数:
+        initiator: 初始折线的点序列（复数表示）
+        motif: 生成元，单位线段上的复数点序列
+        level: 最大迭代层数
+        dtype: 待评估的复数类型
+        duplicate_joints: 是否在每条线段的输出中重复公共端点
+    
+    返回:
+        numpy.ndarray: 第 0..level 层各自的最大绝对偏差
+    """
+    exact = np.asarray(initiator, dtype=np.complex128)
+    approx = np.asarray(initiator, dtype=dtype)
+    exact_motif = _normalize_motif(motif)
+    approx_motif = _normalize_motif(motif, dtype)
+    deviation = [np.abs(approx - exact).max()]
+    for _ in range(level):
+        exact = _subdivide(exact, exact_motif, duplicate_joints)
+        approx = _subdivide(approx, approx_motif, duplicate_joints)
+        deviation.append(np.abs(approx.astype(np.complex128) - exact).max())
+    return np.array(deviation)
+
+def similarity_curve_points(initiator, motif, level, start, stop=None):
+    """
+    直接计算相似性曲线第 level 层（共享端点格式）中的第 start 个点，
+    或下标区间 [start, stop) 内的点，无需生成整条曲线。
+    
+    将下标写成以 (生成元线段数) 为底的数字，每一位选择生成元中的一条
+    线段，点的位置即这些线段仿射映射的复合作用于0的结果。
+    
+    参数:
+        initiator: 初始折线的点序列（复数表示）
+        motif: 生成元，单位线段上的复数点序列
+        level: 迭代层数
+        start: 起始下标
+        stop: 结束下标（不含）；为None时只返回第 start 个点
+    
+    返回:
+        complex 或 numpy.ndarray: 对应的点（与 similarity_curve 的结果一致）
+    """
+    u = np.asarray(initiator, dtype=np.complex128)
+    motif = _normalize_motif(motif)
+    base = len(motif) - 1
+    per_segment = base**level
+    total = (len(u) - 1)*per_segment + 1
+    
+    single = stop is None
+    if single:
+        stop = start + 1
+    if not 0 <= start <= stop <= total:
+        raise IndexError(f"下标区间 [{start}, {stop}) 超出范围 [0, {total})")
+    
+    # 下标超出 int64 时（如 Minkowski 第21层以上）改用 Python 整数（object 数组）逐位分解
+    if total > np.iinfo(np.int64).max:
+        k = np.array(range(start, stop), dtype=object)
+    else:
+        k = np.arange(start, stop, dtype=np.int64)
+    seg = np.minimum(k // per_segment, len(u) - 2)
+    rest = k - seg*per_segment
+    at_end = (rest == per_segment).astype(bool)  # 整条曲线的末点
+    seg = seg.astype(np.int64)
+    
+    # 从最低位开始依次复合生成元线段的仿射映射 z -> m[d] + (m[d+1]-m[d])*z
+    offsets = motif[:-1]
+    spans = np.diff(motif)
+    z = np.zeros(len(k), dtype=np.complex128)
+    for _ in range(level):
+        digit = (rest % base).astype(np.int64)
+        rest //= base
+        z = offsets[digit] + spans[digit]*z
+    z[at_end] = 1
+    
+    points = u[seg] + (u[seg + 1] - u[seg])*z
+    return points[0] if single else points
+
+class CurveCache:
+    """
+    按 (生成元, 初始折线, 输出格式, dtype, 层数) 缓存曲线的 LRU 缓存，总内存不超过 max_bytes。
+    
+    请求更深的层时从已缓存的最深一层继续细分，并缓存途经的每一层，
+    因此依次请求第 1..N 层的代价与直接请求第 N 层相当。
+    返回的数组为只读，以免修改缓存内容。
+    """
+    
+    def __init__(self, max_bytes=256 * 2**20):
+        """
+        :param max_bytes: 缓存数组的总字节数上限
+        """
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._entries = OrderedDict()
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def clear(self):
+        """清空缓存"""
+        self._entries.clear()
+        self.nbytes = 0
+    
+    def curve(self, initiator, motif, level, duplicate_joints=False, dtype=np.complex128):
+        """
+        返回第 level 层曲线，参数含义同 similarity_curve。
+        """
+        u = np.asarray(initiator, dtype=dtype)
+        motif = _normalize_motif(motif, dtype)
+        base = (motif.tobytes(), u.tobytes(), duplicate_joints, np.dtype(dtype).str)
+        
+        # 找到已缓存的最深一层作为起点
+        start = 0
+        for depth in range(level, 0, -1):
+            if (base, depth) in self._entries:
+                self._entries.move_to_end((base, depth))
+                u = self._entries[(base, depth)]
+                start = depth
+                break
+        
+        for depth in range(start + 1, level + 1):
+            u = _subdivide(u, motif, duplicate_joints)
+            u.flags.writeable = False
+            self._store((base, depth), u)
+        return u
+    
+    def _store(self, key, value):
+        if value.nbytes > self.max_bytes:
+            return
+        self._entries[key] = value
+        self.nbytes += value.nbytes
+        while self.nbytes > self.max_bytes:
+            _, old = self._entries.popitem(last=False)
+            self.nbytes -= old.nbytes
 
-def koch_generator(u, level):
+def koch_generator(u, level, chunk_size=None, dtype=np.complex128, cache=None):
     """
     迭代生成科赫曲线的点序列。
     
     参数:
         u: 初始线段的端点数组（复数表示）
         level: 迭代层数
+        chunk_size: 若指定，则以生成器方式按曲线顺序逐块产生点（每块 chunk_size 个）
+        dtype: 点的复数类型，np.complex64 可使内存减半
+        cache: 可选的 CurveCache，用于复用已生成的层
     
     返回:
-        numpy.ndarray: 生成的所有点（复数数组）
+        numpy.ndarray: 生成的所有点（复数数组）；指定 chunk_size 时为点块生成器
     """
     u = np.array([0, 1j])  # 初始竖直线段
     
+    if chunk_size is not None:
+        return iter_similarity_curve(u, KOCH_MOTIF, level, chunk_size, duplicate_joints=True,
+                                     dtype=dtype)
+    
     if level <= 0:
         return u
-        
-    theta = np.pi/3  # 旋转角度60度
     
-    for _ in range(level):
-        new_u = []
-        for i in range(len(u)-1):
-            start = u[i]
-            end = u[i+1]
-            
-            # 生成科赫曲线的四个新线段
-            p1 = start
-            p2 = start + (end - start)/3
-            p3 = p2 + (end - start)/3 * np.exp(1j*theta)
-            p4 = start + 2*(end - start)/3
-            p5 = end
-            
-            new_u.extend([p1, p2, p3, p4, p5])
-        
-        u = np.array(new_u)
+    if cache is not None:
+        return cache.curve(u, KOCH_MOTIF, level, duplicate_joints=True, dtype=dtype)
     
-    return u
+    # 每条线段替换为5个点（4段），相邻线段的公共端点重复输出
+    return similarity_curve(u, KOCH_MOTIF, level, duplicate_joints=True, dtype=dtype)
 
-def minkowski_generator(u, level):
+def minkowski_generator(u, level, chunk_size=None, dtype=np.complex128, cache=None):
     """
     迭代生成闵可夫斯基香肠曲线的点序列。
     
     参数:
         u: 初始线段的端点数组（复数表示）
         level: 迭代层数
+        chunk_size: 若指定，则以生成器方式按曲线顺序逐块产生点（每块 chunk_size 个）
+        dtype: 点的复数类型，np.complex64 可使内存减半
+        cache: 可选的 CurveCache，用于复用已生成的层
     
     返回:
-        numpy.ndarray: 生成的所有点（复数数组）
+        numpy.ndarray: 生成的所有点（复数数组）；指定 chunk_size 时为点块生成器
     """
     u = np.array([0, 1])  # 初始水平线段
     
+    if chunk_size is not None:
+        return iter_similarity_curve(u, _MINKOWSKI_GENERATOR_POINTS, level, chunk_size,
+                                     duplicate_joints=True, dtype=dtype)
+    
     if level <= 0:
         return u
-        
-    theta = np.pi/2  # 旋转角度90度
     
-    for _ in range(level):
-        new_u = []
-        for i in range(len(u)-1):
-            start = u[i]
-            end = u[i+1]
-            
-            # 生成Minkowski曲线的八个新线段
-            p1 = start
-            p2 = start + (end - start)/4
-            p3 = p2 + (end - start)/4 * np.exp(1j*theta)
-            p4 = p2 + (end - start)/4 * (1 + 1j)
-            p5 = start + (end - start)/2 + (end - start)/4 * 1j
-            p6 = start + (end - start)/2
-            p7 = start + (end - start)/2 - (end - start)/4 * 1j
-            p8 = start + 3*(end - start)/4 - (end - start)/4 * 1j
-            p9 = start + 3*(end - start)/4
-            p10 = end
-            
-            new_u.extend([p1, p2, p3, p4, p5, p6, p7, p8, p9, p10])
-        
-        u = np.array(new_u)
+    if cache is not None:
+        return cache.curve(u, _MINKOWSKI_GENERATOR_POINTS, level, duplicate_joints=True,
+                           dtype=dtype)
     
-    return u
+    # 每条线段替换为10个点（8段），相邻线段的公共端点重复输出
+    return similarity_curve(u, _MINKOWSKI_GENERATOR_POINTS, level, duplicate_joints=True,
+                            dtype=dtype)
+
+def curve_extent(points):
+    """
+    计算点序列的范围。
+    
+    参数:
+        points: 点序列（复数数组）
+    
+    返回:
+        tuple: (xmin, xmax, ymin, ymax)
+    """
+    return (points.real.min(), points.real.max(), points.imag.min(), points.imag.max())
+
+def _draw_segments(image, pixels):
+    """
+    将像素坐标下的折线（复数数组，实部为列、虚部为行）一次性画入图像。
+    每条线段按其较长方向的像素数均匀采样，所有线段的采样点一起计算。
+    """
+    start = pixels[:-1]
+    span = pixels[1:] - start
+    samples = np.ceil(np.maximum(np.abs(span.real), np.abs(span.imag))).astype(np.int64) + 1
+    first = np.cumsum(samples) - samples
+    step = np.arange(samples.sum()) - np.repeat(first, samples)
+    t = step / np.repeat(np.maximum(samples - 1, 1), samples)
+    seg = np.repeat(np.arange(len(start)), samples)
+    z = start[seg] + span[seg]*t
+    col = np.rint(z.real).astype(np.int64)
+    row = np.rint(z.imag).astype(np.int64)
+    height, width = image.shape
+    inside = (col >= 0) & (col < width) & (row >= 0) & (row < height)
+    image[row[inside], col[inside]] = 255
+
+def rasterize_curve(points, width=1024, height=1024, extent=None, margin=0.02,
+                    image=None, block_size=1 << 18):
+    """
+    直接把曲线画入 uint8 图像数组，不经过 matplotlib 的线条绘制。
+    
+    参数:
+        points: 点序列（复数数组），或按曲线顺序产生点块的可迭代对象
+            （如 koch_generator(u, level, chunk_size=...) 的返回值）
+        width, height: 图像尺寸（像素）
+        extent: 绘图范围 (xmin, xmax, ymin, ymax)；点序列为数组时默认取其范围，
+            为点块流时必须给出
+        margin: 四周留白占图像尺寸的比例
+        image: 已有的 (height, width) uint8 图像，若给出则在其上继续绘制
+        block_size: 每次向量化绘制的最多点数
+    
+    返回:
+        numpy.ndarray: (height, width) 的 uint8 图像，背景为0，曲线为255
+    """
+    if isinstance(points, np.ndarray):
+        if extent is None:
+            extent = curve_extent(points)
+        chunks = [points]
+    elif extent is None:
+        raise ValueError("按块输入的曲线需要给出 extent")
+    else:
+        chunks = points
+    
+    if image is None:
+        image = np.zeros((height, width), dtype=np.uint8)
+    height, width = image.shape
+    
+    # 保持纵横比，把 extent 居中缩放到去掉留白后的画布上（行号自上而下）
+    xmin, xmax, ymin, ymax = extent
+    usable_w = (width - 1)*(1 - 2*margin)
+    usable_h = (height - 1)*(1 - 2*margin)
+    scale = min(usable_w / max(xmax - xmin, 1e-300), usable_h / max(ymax - ymin, 1e-300))
+    x0 = (width - 1)/2 - scale*(xmin + xmax)/2
+    y0 = (height - 1)/2 + scale*(ymin + ymax)/2
+    
+    last = None
+    for chunk in chunks:
+        chunk = np.asarray(chunk, dtype=np.complex128)
+        for i in range(0, len(chunk), block_size):
+            block = chunk[i:i + block_size]
+            pixels = (x0 + scale*block.real) + 1j*(y0 - scale*block.imag)
+            if last is not None:
+                pixels = np.concatenate(([last], pixels))
+            if len(pixels) > 1:
+                _draw_segments(image, pixels)
+            last = pixels[-1]
+    return image
+
+def save_curve_png(points, filename, width=1024, height=1024, extent=None, cmap='gray_r'):
+    """
+    栅格化曲线并直接写出PNG文件，不创建 matplotlib 图窗。
+    
+    参数:
+        points: 点序列（复数数组）或点块流，见 rasterize_curve
+        filename: 输出文件名
+        width, height: 图像尺寸（像素）
+        extent: 绘图范围 (xmin, xmax, ymin, ymax)
+        cmap: 颜色映射，默认白底黑线
+    
+    返回:
+        numpy.ndarray: 栅格化得到的 uint8 图像
+    """
+    image = rasterize_curve(points, width, height, extent)
+    mpimg.imsave(filename, image, cmap=cmap, vmin=0, vmax=255)
+    return image
 
 if __name__ == "__main__":
     # 初始线段（注意：实际生成器中会覆盖这个值）
     init_u = np.array([0, 1])
+    cache = CurveCache()  # 相邻层级由上一层继续细分
     
     # 创建2x2子图布局
     fig, axs = plt.subplots(2, 2, figsize=(10, 10))
     
     # 生成不同层级的科赫曲线
     for i in range(4):
-        koch_points = koch_generator(init_u, i+1)
+        koch_points = koch_generator(init_u, i+1, cache=cache)
         axs[i//2, i%2].plot(koch_points.real, koch_points.imag, 'k-', lw=1)
         axs[i//2, i%2].set_title(f"Koch Curve Level {i+1}")
         axs[i//2, i%2].axis('equal')
@@ -101,7 +476,7 @@ if __name__ == "__main__":
     # 生成不同层级的Minkowski香肠
     fig, axs = plt.subplots(2, 2, figsize=(10, 10))
     for i in range(4):
-        minkowski_points = minkowski_generator(init_u, i+1)
+        minkowski_points = minkowski_generator(init_u, i+1, cache=cache)
         axs[i//2, i%2].plot(minkowski_points.real, minkowski_points.imag, 'k-', lw=1)
         axs[i//2, i%2].set_title(f"Minkowski Sausage Level {i+1}")
         axs[i//2, i%2].axis('equal')
@@ -109,3 +484,7 @@ if __name__ == "__main__":
     
     plt.tight_layout()
     plt.show()
+
+    # 高层级曲线直接栅格化保存，避免把数百万个顶点交给 plot
+    save_curve_png(koch_generator(init_u, 7, cache=cache), "koch_level7.png")
+    save_curve_png(similarity_curve(init_u, MINKOWSKI_MOTIF, 6), "minkowski_level6.png")
@@ -8,6 +8,8 @@ import unittest
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 #from solution.Iteration_koch_minkowski_solution import koch_generator, minkowski_generator
 from Iteration_koch_minkowski import koch_generator, minkowski_generator
+from Iteration_koch_minkowski import similarity_curve, similarity_curve_points, iter_similarity_curve, KOCH_MOTIF
+from Iteration_koch_minkowski import rasterize_curve, curve_extent, as_xy, dtype_deviation, CurveCache, MINKOWSKI_MOTIF, LEVY_C_MOTIF
 
 class TestFractalCurves(unittest.TestCase):
     def test_koch_generator_level1(self):
@@ -38,5 +40,98 @@ class TestFractalCurves(unittest.TestCase):
         self.assertIsInstance(points, np.ndarray)
         self.assertEqual(len(points), 90)  # 修改为90
 
+    def test_koch_generator_level3_points(self):
+        # 逐线段计算第3层的参考结果，检查向量化实现的点序列
+        u = koch_generator(np.array([0, 1]), 2)
+        d = np.diff(u)
+        w = np.exp(1j*np.pi/3)
+        expected = np.column_stack([u[:-1], u[:-1] + d/3, u[:-1] + d/3 + d/3*w,
+                                    u[:-1] + 2*d/3, u[1:]]).ravel()
+        points = koch_generator(np.array([0, 1]), 3)
+        self.assertEqual(len(points), 95)
+        np.testing.assert_allclose(points, expected, atol=1e-12)
+
+    def test_minkowski_generator_level1_points(self):
+        points = minkowski_generator(np.array([0, 1]), 1)
+        expected = np.array([0, 0.25, 0.25+0.25j, 0.5+0.25j, 0.5+0.25j,
+                             0.5, 0.5-0.25j, 0.75-0.25j, 0.75, 1])
+        np.testing.assert_allclose(points, expected, atol=1e-12)
+
+    def test_similarity_curve_shared_joints(self):
+        for motif, level in [(KOCH_MOTIF, 3), (MINKOWSKI_MOTIF, 2), (LEVY_C_MOTIF, 6)]:
+            points = similarity_curve(np.array([0, 1]), motif, level)
+            self.assertEqual(len(points), (len(motif) - 1)**level + 1)
+            self.assertEqual(points[0], 0)
+            self.assertEqual(points[-1], 1)
+
+    def test_similarity_curve_matches_koch_generator(self):
+        points = similarity_curve(np.array([0, 1j]), KOCH_MOTIF, 3, duplicate_joints=True)
+        np.testing.assert_allclose(points, koch_generator(np.array([0, 1]), 3), atol=1e-12)
+
+    def test_similarity_curve_points_range(self):
+        init = np.array([0, 1, 1 + 1j])
+        full = similarity_curve(init, MINKOWSKI_MOTIF, 3)
+        points = similarity_curve_points(init, MINKOWSKI_MOTIF, 3, 500, len(full))
+        np.testing.assert_allclose(points, full[500:], atol=1e-12)
+        point = similarity_curve_points(init, KOCH_MOTIF, 4, 100)
+        self.assertAlmostEqual(point, similarity_curve(init, KOCH_MOTIF, 4)[100])
+        with self.assertRaises(IndexError):
+            similarity_curve_points(init, KOCH_MOTIF, 1, 0, 10)
+        # 下标超出 int64 的深层曲线：第3层的点 k 即第22层的点 k * 8**19
+        deep = [similarity_curve_points(init, MINKOWSKI_MOTIF, 22, k * 8**19) for k in range(500, 504)]
+        np.testing.assert_allclose(deep, full[500:504], atol=1e-12)
+        np.testing.assert_allclose(similarity_curve_points(init, MINKOWSKI_MOTIF, 22, 500 * 8**19, 500 * 8**19 + 3),
+                                   full[500], atol=1e-12)
+        self.assertEqual(similarity_curve_points(init, MINKOWSKI_MOTIF, 22, 2 * 8**22), 1 + 1j)
+
+    def test_chunked_generators(self):
+        chunks = list(koch_generator(np.array([0, 1]), 3, chunk_size=16))
+        self.assertTrue(all(len(c) == 16 for c in chunks[:-1]))
+        np.testing.assert_array_equal(np.concatenate(chunks), koch_generator(np.array([0, 1]), 3))
+        chunks = list(minkowski_generator(np.array([0, 1]), 2, chunk_size=7))
+        np.testing.assert_array_equal(np.concatenate(chunks), minkowski_generator(np.array([0, 1]), 2))
+
+    def test_iter_similarity_curve(self):
+        init = np.array([0, 1, 1j])
+        points = np.concatenate(list(iter_similarity_curve(init, MINKOWSKI_MOTIF, 3, chunk_size=50)))
+        np.testing.assert_array_equal(points, similarity_curve(init, MINKOWSKI_MOTIF, 3))
+
+    def test_rasterize_curve(self):
+        image = rasterize_curve(np.array([0, 1]), width=64, height=32, margin=0)
+        self.assertEqual(image.dtype, np.uint8)
+        self.assertEqual(image.shape, (32, 64))
+        # 水平线段占满中间一行
+        self.assertEqual(int((image == 255).sum()), 64)
+        points = similarity_curve(np.array([0, 1]), KOCH_MOTIF, 4)
+        chunks = iter_similarity_curve(np.array([0, 1]), KOCH_MOTIF, 4, chunk_size=10)
+        np.testing.assert_array_equal(
+            rasterize_curve(chunks, 128, 128, extent=curve_extent(points)),
+            rasterize_curve(points, 128, 128))
+
+    def test_complex64_mode(self):
+        points = koch_generator(np.array([0, 1]), 3, dtype=np.complex64)
+        self.assertEqual(points.dtype, np.complex64)
+        np.testing.assert_allclose(points, koch_generator(np.array([0, 1]), 3), atol=1e-6)
+        xy = as_xy(points)
+        self.assertEqual(xy.dtype, np.float32)
+        self.assertEqual(xy.shape, (len(points), 2))
+        deviation = dtype_deviation(np.array([0, 1]), KOCH_MOTIF, 5)
+        self.assertEqual(len(deviation), 6)
+        self.assertTrue(np.all(deviation < 1e-6))
+
+    def test_curve_cache(self):
+        cache = CurveCache()
+        for level in range(1, 5):
+            points = koch_generator(np.array([0, 1]), level, cache=cache)
+        self.assertEqual(len(cache), 4)
+        np.testing.assert_array_equal(points, koch_generator(np.array([0, 1]), 4))
+        self.assertIs(koch_generator(np.array([0, 1]), 2, cache=cache),
+                      koch_generator(np.array([0, 1]), 2, cache=cache))
+        # 超出内存预算时淘汰最久未使用的层
+        small = CurveCache(max_bytes=2000)
+        small.curve(np.array([0, 1]), KOCH_MOTIF, 4)
+        self.assertLessEqual(small.nbytes, 2000)
+        self.assertEqual(len(small), 3)
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
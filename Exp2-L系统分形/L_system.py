@@ -1,57 +1,1042 @@
 import matplotlib.pyplot as plt
+import matplotlib.image as mpimg
+from matplotlib.collections import LineCollection
+import numpy as np
 import math
+from bisect import bisect_right
+from itertools import chain
 
 
-def apply_rules(axiom, rules, iterations):
+def _require_deterministic(rules, name):
+    """随机规则（后继为 [(后继, 权重), ...]）没有唯一的展开结果，只接受字符串后继"""
+    if any(not isinstance(successor, str) for successor in rules.values()):
+        raise ValueError(f"{name} 只支持确定性规则")
+
+
+def _production_matrix(axiom, rules, name):
+    """
+    构造产生式的符号计数矩阵
+    :param axiom: 初始字符串
+    :param rules: 确定性规则字典
+    :param name: 调用者名称，用于错误信息
+    :return: (字母表列表, 矩阵M)，M[i, j] 为符号i替换后得到的符号j的个数（整数精确计算）
+    """
+    _require_deterministic(rules, name)
+    alphabet = sorted(set(axiom).union(*rules.keys(), *rules.values()))
+    index = {ch: i for i, ch in enumerate(alphabet)}
+    matrix = np.zeros((len(alphabet), len(alphabet)), dtype=object)
+    for ch in alphabet:
+        successor = rules.get(ch, ch)
+        for out in successor:
+            matrix[index[ch], index[out]] += 1
+    return alphabet, matrix
+
+
+def predict_lengths(axiom, rules, iterations):
+    """
+    不生成字符串，由符号计数矩阵计算每轮迭代后字符串的精确长度
+    :param axiom: 初始字符串
+    :param rules: 确定性规则字典
+    :param iterations: 迭代次数
+    :return: 长度列表，第k项为迭代k轮后的长度（k = 0..iterations）
+    """
+    alphabet, matrix = _production_matrix(axiom, rules, "predict_lengths")
+    counts = np.array([axiom.count(ch) for ch in alphabet], dtype=object)
+    lengths = [len(axiom)]
+    for _ in range(iterations):
+        counts = counts.dot(matrix)
+        lengths.append(int(counts.sum()))
+    return lengths
+
+
+def symbol_counts(axiom, rules, iterations):
+    """
+    不生成字符串，用产生式矩阵的幂计算迭代后每个符号出现的次数
+    矩阵幂采用二进制快速幂，代价为 O(字母表大小^3 * log(iterations))，结果为精确整数
+    :param axiom: 初始字符串
+    :param rules: 确定性规则字典
+    :param iterations: 迭代次数
+    :return: 字典 {符号: 个数}
+    """
+    alphabet, matrix = _production_matrix(axiom, rules, "symbol_counts")
+    counts = np.array([axiom.count(ch) for ch in alphabet], dtype=object)
+    power = matrix
+    n = iterations
+    while n:
+        if n & 1:
+            counts = counts.dot(power)
+        n >>= 1
+        if n:
+            power = power.dot(power)
+    return {ch: int(c) for ch, c in zip(alphabet, counts)}
+
+
+def l_system_stats(axiom, rules, iterations, draw_symbols="F"):
+    """
+    统计迭代后字符串的总长度、绘制线段数和分支数（用于容量估计和预分配缓冲区）
+    :param axiom: 初始字符串
+    :param rules: 规则字典
+    :param iterations: 迭代次数
+    :param draw_symbols: 视为画线的符号
+    :return: 字典，包含 length（符号总数）、segments（画线符号数）、branches（'[' 的个数）
+    """
+    counts = symbol_counts(axiom, rules, iterations)
+    return {
+        "length": sum(counts.values()),
+        "segments": sum(counts.get(ch, 0) for ch in draw_symbols),
+        "branches": counts.get("[", 0),
+    }
+
+
+# 随机规则的各个候选后继在替换前临时编码为补充私用区字符
+_VARIANT_BASE = 0xF0000
+
+
+def _stochastic_tables(rules):
+    """
+    拆分确定性规则与随机规则
+    :return: (translate 表, [(符号编码, 候选起始编码, 累积概率)])
+    """
+    table = {}
+    stochastic = []
+    next_code = _VARIANT_BASE
+    for ch in sorted(rules):
+        successor = rules[ch]
+        if len(ch) != 1:
+            continue
+        if isinstance(successor, str):
+            table[ord(ch)] = successor
+            continue
+        successors, weights = zip(*successor)
+        weights = np.asarray(weights, dtype=float)
+        if np.any(weights < 0) or weights.sum() <= 0:
+            raise ValueError(f"符号 {ch!r} 的规则权重必须非负且不全为0")
+        for i, option in enumerate(successors):
+            table[next_code + i] = option
+        stochastic.append((ord(ch), next_code, np.cumsum(weights) / weights.sum()))
+        next_code += len(successors)
+    return table, stochastic
+
+
+def apply_rules(axiom, rules, iterations, max_length=None, seed=None):
     """
     生成L-System字符串
     :param axiom: 初始字符串（如"F"或"0"）
-    :param rules: 规则字典，如{"F": "F+F--F+F"} 或 {"1": "11", "0": "1[0]0"}
+    :param rules: 规则字典，如{"F": "F+F--F+F"} 或 {"1": "11", "0": "1[0]0"}；
+                  随机规则的值为 [(后继, 权重), ...]，如 {"F": [("F[+F]F", 1), ("F[-F]F", 2)]}
     :param iterations: 迭代次数
+    :param max_length: 若指定，在生成前预测最终长度，超过该值则抛出ValueError（仅适用于确定性规则）
+    :param seed: 随机规则的随机数种子，相同种子得到相同结果
     :return: 经过多轮迭代后的最终字符串
     """
+    table, stochastic = _stochastic_tables(rules)
+    if stochastic and any(ord(ch) >= _VARIANT_BASE for text in (axiom, *table.values()) for ch in text):
+        raise ValueError(f"使用随机规则时字符串中不能含编码不小于 {_VARIANT_BASE:#x} 的字符")
+    if max_length is not None:
+        if stochastic:
+            raise ValueError("max_length 仅适用于确定性规则")
+        final_length = predict_lengths(axiom, rules, iterations)[-1]
+        if final_length > max_length:
+            raise ValueError(f"迭代{iterations}轮后字符串长度为{final_length}，超过上限{max_length}")
+
+    # 规则按单个字符匹配，用 str.translate 一次完成整串替换（线性时间）
+    rng = np.random.default_rng(seed)
     current_string = axiom
     for _ in range(iterations):
-        new_string = ""
-        for char in current_string:
-            if char in rules:
-                new_string += rules[char]
-            else:
-                new_string += char
-        current_string = new_string
+        if stochastic:
+            # 每个随机符号的所有出现位置一次性抽取候选，并替换为对应的临时字符
+            codes = np.frombuffer(current_string.encode('utf-32-le'), dtype=np.uint32).copy()
+            for code, variant, cumulative in stochastic:
+                where = np.flatnonzero(codes == code)
+                choice = np.searchsorted(cumulative, rng.random(len(where)), side='right')
+                codes[where] = variant + np.minimum(choice, len(cumulative) - 1)
+            current_string = codes.tobytes().decode('utf-32-le')
+        current_string = current_string.translate(table)
     return current_string
 
 
-def draw_l_system(instructions, angle, step, start_pos=(0, 0), start_angle=0, savefile=None, **kwargs):
+def _parse_modules(text):
+    """
+    把 "F(l/3)+F(math.sqrt(l))" 这样的模块串解析为 [(符号, 参数表达式或None), ...]
+    参数按括号配对扫描，表达式中可以含函数调用等嵌套括号
+    """
+    modules = []
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if ch == ')':
+            raise ValueError(f"模块串 {text!r} 第{i}个字符处的 ')' 没有配对")
+        i += 1
+        if i == len(text) or text[i] != '(':
+            modules.append((ch, None))
+            continue
+        depth = 0
+        several = False
+        for j in range(i, len(text)):
+            if text[j] == '(':
+                depth += 1
+            elif text[j] == ')':
+                depth -= 1
+                if depth == 0:
+                    break
+            elif text[j] == ',' and depth == 1:
+                several = True
+        if depth:
+            raise ValueError(f"模块串 {text!r} 第{i}个字符处的 '(' 没有配对")
+        if several:
+            raise ValueError(f"模块 {text[i - 1:j + 1]!r} 只支持一个参数")
+        modules.append((ch, text[i + 1:j]))
+        i = j + 1
+    return modules
+
+
+def apply_parametric_rules(axiom, rules, iterations):
+    """
+    生成参数化L-System（每个模块最多带一个实数参数，如 F(l)）
+    每一代按规则批量改写：同一符号的所有出现位置一起用 numpy 计算后继模块的参数
+    :param axiom: 初始模块串，如 "F(1)"
+    :param rules: 规则字典，键为带形参的模块，如 {"F(l)": "F(l/3)+F(l/3)--F(l/3)+F(l/3)"}；
+                  参数表达式可使用形参、np 和 math
+    :param iterations: 迭代次数
+    :return: (symbols, params)，symbols 为符号串，params[i] 为第i个模块的参数（无参数时为NaN）
+    """
+    names = {}
+    templates = {}
+    for head, successor in rules.items():
+        (ch, name), = _parse_modules(head)
+        names[ord(ch)] = name.strip() if name else None
+        templates[ord(ch)] = [(ord(c), None if expr is None else compile(expr, head, 'eval'))
+                              for c, expr in _parse_modules(successor)]
+
+    modules = _parse_modules(axiom)
+    codes = np.array([ord(ch) for ch, _ in modules], dtype=np.uint32)
+    params = np.array([np.nan if expr is None else float(eval(expr, {'np': np, 'math': math}))
+                       for _, expr in modules])
+    for _ in range(iterations):
+        lengths = np.ones(len(codes), dtype=np.int64)
+        positions = {}
+        for code, template in templates.items():
+            positions[code] = np.flatnonzero(codes == code)
+            lengths[positions[code]] = len(template)
+        offsets = np.cumsum(lengths) - lengths
+        new_codes = np.empty(int(lengths.sum()), dtype=np.uint32)
+        new_params = np.empty(len(new_codes))
+
+        fixed = ~np.isin(codes, list(templates))
+        new_codes[offsets[fixed]] = codes[fixed]
+        new_params[offsets[fixed]] = params[fixed]
+        for code, template in templates.items():
+            where = positions[code]
+            for j, (out, expr) in enumerate(template):
+                new_codes[offsets[where] + j] = out
+                new_params[offsets[where] + j] = (np.nan if expr is None
+                                                  else _eval_param(expr, names[code], params[where]))
+        codes, params = new_codes, new_params
+    return codes.tobytes().decode('utf-32-le') if len(codes) else '', params
+
+
+def _eval_param(expr, name, values):
+    """
+    对同一符号的所有出现位置计算参数表达式：先整体按数组计算，
+    表达式只接受标量（如 math.sqrt）时逐个计算
+    """
+    scope = {'np': np, 'math': math}
+    if name:
+        scope[name] = values
+    try:
+        return eval(expr, scope)
+    except TypeError:
+        if not name:
+            raise
+    return np.array([eval(expr, {'np': np, 'math': math, name: float(v)}) for v in values])
+
+
+def format_modules(symbols, params, precision=6):
+    """
+    把 apply_parametric_rules 的结果格式化为模块串，如 "F(0.333333)+F(0.333333)"
+    :param symbols: 符号串
+    :param params: 各模块的参数
+    :param precision: 参数的有效数字位数
+    :return: 模块串
+    """
+    return ''.join(ch if np.isnan(p) else f"{ch}({p:.{precision}g})" for ch, p in zip(symbols, params))
+
+
+def _iter_pieces(axiom, rules, iterations, leaf_limit):
+    """
+    深度优先遍历重写树，按顺序产生最终字符串的各个片段
+    展开后长度不超过 leaf_limit 的 (符号, 剩余深度) 直接用缓存的展开串输出，
+    其余符号压栈继续展开；栈深度不超过 iterations
+    """
+    lengths = {}
+    expansions = {}
+
+    def expanded_length(ch, depth):
+        if depth == 0 or ch not in rules:
+            return 1
+        key = (ch, depth)
+        if key not in lengths:
+            lengths[key] = sum(expanded_length(c, depth - 1) for c in rules[ch])
+        return lengths[key]
+
+    def expansion(ch, depth):
+        if depth == 0 or ch not in rules:
+            return ch
+        key = (ch, depth)
+        if key not in expansions:
+            expansions[key] = ''.join(expansion(c, depth - 1) for c in rules[ch])
+        return expansions[key]
+
+    stack = [(iter(axiom), iterations)]
+    while stack:
+        symbols, depth = stack[-1]
+        ch = next(symbols, None)
+        if ch is None:
+            stack.pop()
+        elif expanded_length(ch, depth) <= leaf_limit:
+            yield expansion(ch, depth)
+        else:
+            stack.append((iter(rules[ch]), depth - 1))
+
+
+def iter_l_system(axiom, rules, iterations, chunk_size=None):
+    """
+    惰性生成L-System字符串，不构造完整的最终字符串
+    :param axiom: 初始字符串
+    :param rules: 确定性规则字典
+    :param iterations: 迭代次数
+    :param chunk_size: 为None时逐个产生符号；否则产生长度为chunk_size的字符串块（最后一块可能较短）
+    :return: 生成器，按顺序拼接后与 apply_rules 的结果相同
+    """
+    _require_deterministic(rules, "iter_l_system")
+    rules = {ch: successor for ch, successor in rules.items() if len(ch) == 1}
+    if chunk_size is None:
+        return chain.from_iterable(_iter_pieces(axiom, rules, iterations, 4096))
+    if chunk_size < 1:
+        raise ValueError("chunk_size 必须为正整数")
+    return _rechunk(_iter_pieces(axiom, rules, iterations, chunk_size), chunk_size)
+
+
+def _rechunk(pieces, chunk_size):
+    """把长度不一的字符串片段重新切分为固定长度的块"""
+    buf = []
+    count = 0
+    for piece in pieces:
+        buf.append(piece)
+        count += len(piece)
+        if count >= chunk_size:
+            joined = ''.join(buf)
+            cut = len(joined) - len(joined) % chunk_size
+            for i in range(0, cut, chunk_size):
+                yield joined[i:i + chunk_size]
+            buf = [joined[cut:]]
+            count = len(buf[0])
+    if count:
+        yield ''.join(buf)
+
+
+class LSystemString:
+    """
+    L-System 最终字符串的压缩表示：只记录每个 (符号, 剩余深度) 展开后的长度和子节点偏移，
+    整体是一个按深度共享的有向无环图，大小与字母表和迭代次数成正比，而与字符串长度无关。
+    支持 len()、下标与切片、单个符号计数和流式迭代，无需构造完整字符串。
+    """
+
+    # 展开长度不超过该值的子树，切片时直接使用缓存的展开串
+    _LEAF_LIMIT = 1024
+
+    def __init__(self, axiom, rules, iterations):
+        """
+        :param axiom: 初始字符串
+        :param rules: 确定性规则字典
+        :param iterations: 迭代次数
+        """
+        _require_deterministic(rules, "LSystemString")
+        self.axiom = axiom
+        self.rules = {ch: successor for ch, successor in rules.items() if len(ch) == 1}
+        self.iterations = iterations
+        self._offsets = {}
+        self._counts = {}
+        self._expansions = {}
+        self._top = self._child_offsets(axiom, iterations)
+
+    def _child_offsets(self, children, depth):
+        """子节点在 depth 深度下展开后的累积长度（首项为0）"""
+        offsets = [0]
+        for ch in children:
+            offsets.append(offsets[-1] + self._length(ch, depth))
+        return offsets
+
+    def _length(self, ch, depth):
+        if depth == 0 or ch not in self.rules:
+            return 1
+        key = (ch, depth)
+        if key not in self._offsets:
+            self._offsets[key] = self._child_offsets(self.rules[ch], depth - 1)
+        return self._offsets[key][-1]
+
+    @property
+    def length(self):
+        """字符串长度（精确整数，可超过 sys.maxsize）"""
+        return self._top[-1]
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, stride = index.indices(self.length)
+            if stride != 1:
+                return ''.join(self[i] for i in range(start, stop, stride))
+            out = []
+            if start < stop:
+                self._collect(self.axiom, self._top, self.iterations, start, stop, out)
+            return ''.join(out)
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("LSystemString 下标越界")
+        # 自顶向下，每层用二分查找定位包含该位置的子节点
+        children, offsets, depth = self.axiom, self._top, self.iterations
+        while True:
+            i = bisect_right(offsets, index) - 1
+            ch = children[i]
+            index -= offsets[i]
+            if depth == 0 or ch not in self.rules:
+                return ch
+            children, offsets, depth = self.rules[ch], self._offsets[(ch, depth)], depth - 1
+
+    def _expansion(self, ch, depth):
+        if depth == 0 or ch not in self.rules:
+            return ch
+        key = (ch, depth)
+        if key not in self._expansions:
+            self._expansions[key] = ''.join(self._expansion(c, depth - 1) for c in self.rules[ch])
+        return self._expansions[key]
+
+    def _collect(self, children, offsets, depth, start, stop, out):
+        """把子节点序列展开结果中 [start, stop) 的部分追加到 out"""
+        first = bisect_right(offsets, start) - 1
+        for i in range(first, len(children)):
+            lo, hi = offsets[i], offsets[i + 1]
+            if lo >= stop:
+                break
+            ch = children[i]
+            if depth == 0 or ch not in self.rules:
+                out.append(ch)
+            elif hi - lo <= self._LEAF_LIMIT:
+                out.append(self._expansion(ch, depth)[max(start - lo, 0):stop - lo])
+            else:
+                self._collect(self.rules[ch], self._offsets[(ch, depth)], depth - 1,
+                              max(start - lo, 0), min(stop, hi) - lo, out)
+
+    def _symbol_counts(self, ch, depth):
+        if depth == 0 or ch not in self.rules:
+            return {ch: 1}
+        key = (ch, depth)
+        if key not in self._counts:
+            total = {}
+            for c in self.rules[ch]:
+                for symbol, n in self._symbol_counts(c, depth - 1).items():
+                    total[symbol] = total.get(symbol, 0) + n
+            self._counts[key] = total
+        return self._counts[key]
+
+    def count(self, symbol):
+        """
+        统计单个符号的出现次数
+        :param symbol: 单个字符
+        :return: 出现次数（精确整数）
+        """
+        if len(symbol) != 1:
+            raise ValueError("count 只支持单个符号")
+        return sum(self._symbol_counts(ch, self.iterations).get(symbol, 0) for ch in self.axiom)
+
+    def __iter__(self):
+        return iter_l_system(self.axiom, self.rules, self.iterations)
+
+    def chunks(self, chunk_size=1 << 16):
+        """按顺序产生长度为 chunk_size 的字符串块"""
+        return iter_l_system(self.axiom, self.rules, self.iterations, chunk_size)
+
+    def __str__(self):
+        return self[:]
+
+
+def _symbol_codes(instructions):
+    """把指令字符串转换为字符编码数组"""
+    return np.frombuffer(instructions.encode('utf-32-le'), dtype=np.uint32)
+
+
+# 解释符号流时每块的符号数
+TURTLE_CHUNK = 1 << 16
+
+
+def _turtle_ops(text, program):
+    """把指令字符串映射为操作码，并去掉不产生动作的符号"""
+    codes = _symbol_codes(text)
+    ops = np.zeros(len(codes), dtype=np.uint8)
+    known = codes < len(program)
+    ops[known] = program[codes[known]]
+    return ops[ops != NOP]
+
+
+def _direction_table(angle):
+    """
+    转角整除360度时，朝向只可能取有限个值，返回这些朝向（相对起始朝向）的单位向量表
+    :param angle: 每次转向的角度（度）
+    :return: 复数数组，第j项为转过 j*angle 度后的单位向量；转角不整除360度时返回None
+    """
+    if angle == 0:
+        return np.ones(1, dtype=np.complex128)
+    count = 360 / abs(angle)
+    if abs(count - round(count)) > 1e-9:
+        return None
+    table = np.exp(1j * np.radians(angle) * np.arange(round(count)))
+    # 消除 cos(90°) 等处的舍入误差，使轴向朝向精确
+    table.real[np.abs(table.real) < 1e-15] = 0
+    table.imag[np.abs(table.imag) < 1e-15] = 0
+    return table
+
+
+# 海龟动作的操作码
+NOP, DRAW, MOVE, TURN_LEFT, TURN_RIGHT, PUSH, POP, PUSH_TURN, POP_TURN, SCALE_STEP, CHANGE_WIDTH = range(11)
+
+ACTION_CODES = {
+    'nop': NOP,
+    'draw': DRAW,              # 前进并画线
+    'move': MOVE,              # 前进不画线
+    'left': TURN_LEFT,         # 朝向 +angle
+    'right': TURN_RIGHT,       # 朝向 -angle
+    'push': PUSH,              # 保存状态
+    'pop': POP,                # 恢复状态
+    'push_turn': PUSH_TURN,    # 保存状态后左转（分形树模式的 '['）
+    'pop_turn': POP_TURN,      # 恢复状态后右转（分形树模式的 ']'）
+    'scale_step': SCALE_STEP,  # 步长乘以 step_scale
+    'change_width': CHANGE_WIDTH,  # 线宽乘以 width_scale
+}
+
+DEFAULT_ACTIONS = {'F': 'draw', 'f': 'move', '+': 'left', '-': 'right', '[': 'push', ']': 'pop'}
+
+# 分形二叉树（如 {"1": "11", "0": "1[0]0"}）中画线的符号，tree_mode 下默认加入
+TREE_DRAW_SYMBOLS = '01'
+
+
+def compile_turtle(actions=None, tree_mode=False):
+    """
+    把“符号 -> 动作”映射编译为按字符编码索引的操作码表，只需编译一次即可重复使用
+    :param actions: 字典，如 {'F': 'draw', '+': 'left'}，动作名见 ACTION_CODES；默认为 DEFAULT_ACTIONS
+    :param tree_mode: 为True时 '[' 压栈后左转、']' 出栈后右转；使用默认动作时 TREE_DRAW_SYMBOLS 也画线
+    :return: uint8 操作码表，未列出的符号为 NOP
+    """
+    default = actions is None
+    actions = dict(DEFAULT_ACTIONS if default else actions)
+    if tree_mode:
+        if default:
+            actions.update(dict.fromkeys(TREE_DRAW_SYMBOLS, 'draw'))
+        actions.update({'[': 'push_turn', ']': 'pop_turn'})
+    table = np.zeros(max(map(ord, actions), default=0) + 1, dtype=np.uint8)
+    for ch, action in actions.items():
+        if action not in ACTION_CODES:
+            raise ValueError(f"未知的海龟动作: {action}")
+        table[ord(ch)] = ACTION_CODES[action]
+    return table
+
+
+def _turtle_loop(ops, step, step_scale, width_scale, x, y, theta0, theta,
+                 table_x, table_y, stack, segments, widths):
+    """
+    逐条执行操作码的海龟解释器（纯Python；可用 numba 编译）
+    table_x/table_y 为朝向单位向量表（已含起始朝向），为空时按 theta0 + k*theta 计算朝向
+    """
+    n_dir = len(table_x)
+    k = 0
+    s = step
+    w = 1.0
+    n = 0
+    top = 0
+    for op in ops:
+        if op == DRAW or op == MOVE:
+            if n_dir > 0:
+                dx = table_x[k % n_dir]
+                dy = table_y[k % n_dir]
+            else:
+                dx = math.cos(theta0 + k * theta)
+                dy = math.sin(theta0 + k * theta)
+            nx = x + s * dx
+            ny = y + s * dy
+            if op == DRAW:
+                segments[n, 0, 0] = x
+                segments[n, 0, 1] = y
+                segments[n, 1, 0] = nx
+                segments[n, 1, 1] = ny
+                widths[n] = w
+                n += 1
+            x = nx
+            y = ny
+        elif op == TURN_LEFT:
+            k += 1
+        elif op == TURN_RIGHT:
+            k -= 1
+        elif op == PUSH or op == PUSH_TURN:
+            stack[top, 0] = x
+            stack[top, 1] = y
+            stack[top, 2] = k
+            stack[top, 3] = s
+            stack[top, 4] = w
+            top += 1
+            if op == PUSH_TURN:
+                k += 1
+        elif op == POP or op == POP_TURN:
+            if top == 0:
+                raise IndexError("pop from empty list")
+            top -= 1
+            x = stack[top, 0]
+            y = stack[top, 1]
+            k = int(stack[top, 2])
+            s = stack[top, 3]
+            w = stack[top, 4]
+            if op == POP_TURN:
+                k -= 1
+        elif op == SCALE_STEP:
+            s *= step_scale
+        elif op == CHANGE_WIDTH:
+            w *= width_scale
+    return n
+
+
+try:
+    import numba
+    _turtle_loop_jit = numba.njit(cache=False)(_turtle_loop)
+except ImportError:
+    numba = None
+    _turtle_loop_jit = None
+
+
+def _run_loop(ops, loop, step, step_scale, width_scale, start_pos, start_angle, angle, table):
+    """用逐条执行的解释器（纯Python 或 numba 编译版）计算线段"""
+    count = int(np.count_nonzero(ops == DRAW))
+    segments = np.empty((count, 2, 2))
+    widths = np.empty(count)
+    stack = np.empty((int(np.count_nonzero((ops == PUSH) | (ops == PUSH_TURN))), 5))
+    theta0 = math.radians(start_angle)
+    if table is not None:
+        table = np.exp(1j * theta0) * table
+        table_x, table_y = table.real.copy(), table.imag.copy()
+    else:
+        table_x = table_y = np.empty(0)
+    if loop is _turtle_loop:
+        ops = ops.tolist()  # 纯Python循环中逐个读取列表元素更快
+    loop(ops, float(step), float(step_scale), float(width_scale), float(start_pos[0]),
+         float(start_pos[1]), theta0, math.radians(angle), table_x, table_y, stack, segments, widths)
+    return segments, widths
+
+
+def _run_numpy(ops, step, step_scale, width_scale, start_pos, start_angle, angle, table, state=None):
+    """
+    数组程序版解释器：以括号为界划分指令段，段内朝向、步长、线宽和位置都由累加和一次算出，
+    '['/']' 的压栈与出栈只需对各段遍历一次
+    state 为字典时从其中的海龟状态（位置、转向次数、步长/线宽指数、栈）继续，并在结束时更新，
+    用于分块解释指令流
+    """
+    is_draw = ops == DRAW
+    turn = (ops == TURN_LEFT).astype(np.int64) - (ops == TURN_RIGHT)
+    is_push = (ops == PUSH) | (ops == PUSH_TURN)
+    is_bracket = is_push | (ops == POP) | (ops == POP_TURN)
+
+    # 以括号为界划分指令段，每段以括号符号开头（第0段除外）
+    run_id = np.cumsum(is_bracket)
+    starts = np.concatenate(([0], np.flatnonzero(is_bracket)))
+    ends = np.append(starts[1:] - 1, len(ops) - 1)
+
+    def local_cumsum(values):
+        total = np.cumsum(values)
+        return total - (total - values)[starts][run_id]
+
+    # 段内相对朝向（转向次数）、步长与线宽的指数，以及相对位移（以段起点状态为基准）
+    local_k = local_cumsum(turn)
+    local_se = local_cumsum((ops == SCALE_STEP).astype(np.int64))
+    local_we = local_cumsum((ops == CHANGE_WIDTH).astype(np.int64))
+    if table is not None:
+        unit = table[local_k % len(table)]
+    else:
+        unit = np.exp(1j * np.radians(angle) * local_k)
+    local_step = np.where(is_draw | (ops == MOVE), unit * np.power(float(step_scale), local_se), 0)
+    local_pos = local_cumsum(local_step)
+
+    # 逐段推进海龟状态，括号处压栈/出栈，得到每段起点的绝对位置、朝向和步长/线宽指数
+    run_op = ops[starts].tolist()
+    run_op[0] = NOP
+    # 指令以括号开头时第0段为空，其累计量为0
+    nonempty = ends >= starts
+
+    def run_total(values):
+        return np.where(nonempty, values[ends], 0).tolist()
+
+    runs = zip(run_op, run_total(local_k), run_total(local_se), run_total(local_we),
+               run_total(local_pos * step))
+    theta0 = math.radians(start_angle)
+    theta = math.radians(angle)
+    start_dir = complex(math.cos(theta0), math.sin(theta0))
+    # 朝向单位向量按转向次数缓存；可查表时预先填满一个周期
+    period = len(table) if table is not None else 0
+    directions = dict(enumerate((start_dir * table).tolist())) if period else {}
+    anchors = []
+    anchor_pos = []
+    if state is None:
+        state = {}
+    pos = state.get('pos', complex(*start_pos))
+    k = state.get('k', 0)
+    se = state.get('se', 0)
+    we = state.get('we', 0)
+    stack = state.setdefault('stack', [])
+    for op, dk, dse, dwe, dpos in runs:
+        if op == PUSH:
+            stack.append((pos, k, se, we))
+        elif op == POP:
+            pos, k, se, we = stack.pop()
+        elif op == PUSH_TURN:
+            stack.append((pos, k, se, we))
+            k += 1
+        elif op == POP_TURN:
+            pos, k, se, we = stack.pop()
+            k -= 1
+        anchor_pos.append(pos)
+        anchors.append((k, se, we))
+        key = k % period if period else k
+        direction = directions.get(key)
+        if direction is None:
+            direction = directions[key] = complex(math.cos(theta0 + k * theta), math.sin(theta0 + k * theta))
+        pos += direction * dpos * step_scale**se if se else direction * dpos
+        k += dk
+        se += dse
+        we += dwe
+    state.update(pos=pos, k=k, se=se, we=we)
+
+    # 还原为绝对坐标，取出画线符号对应的线段
+    anchor_k, anchor_se, anchor_we = np.array(anchors, dtype=np.int64).T
+    anchor_pos = np.array(anchor_pos, dtype=np.complex128)
+    if table is not None:
+        rotation = start_dir * table[anchor_k % len(table)]
+    else:
+        rotation = np.exp(1j * (theta0 + theta * anchor_k))
+    rotation = rotation * step * np.power(float(step_scale), anchor_se)
+    index = np.flatnonzero(is_draw)
+    seg_run = run_id[index]
+    end = anchor_pos[seg_run] + rotation[seg_run] * local_pos[index]
+    begin = end - rotation[seg_run] * local_step[index]
+    segments = np.empty((len(index), 2, 2))
+    segments[:, 0, 0] = begin.real
+    segments[:, 0, 1] = begin.imag
+    segments[:, 1, 0] = end.real
+    segments[:, 1, 1] = end.imag
+    widths = np.power(float(width_scale), anchor_we[seg_run] + local_we[index])
+    return segments, widths
+
+
+def run_turtle(instructions, program, angle, step, start_pos=(0, 0), start_angle=0,
+               step_scale=1.0, width_scale=1.0, backend='auto'):
+    """
+    用编译好的操作码表解释L-System指令
+    :param instructions: 指令字符串，或按顺序产生符号/字符串块的可迭代对象
+    :param program: compile_turtle 返回的操作码表
+    :param angle: 每次转向的角度（度）
+    :param step: 初始步长
+    :param start_pos: 起始坐标 (x, y)
+    :param start_angle: 起始角度（0表示向右，90表示向上）
+    :param step_scale: 'scale_step' 动作的步长缩放因子
+    :param width_scale: 'change_width' 动作的线宽缩放因子
+    :param backend: 'numba'（需安装numba）、'numpy'（数组程序）、'python'（纯Python循环）；
+                    'auto' 在安装了numba时用numba，否则用numpy
+    :return: (segments, widths)，segments 形状为 (N, 2, 2)，widths 为各线段的相对线宽
+    """
+    if backend == 'auto':
+        backend = 'numba' if _turtle_loop_jit is not None else 'numpy'
+    if backend not in ('numpy', 'numba', 'python'):
+        raise ValueError(f"未知的后端: {backend}")
+    if not isinstance(instructions, str):
+        # 符号流按块处理，不拼接完整的指令字符串
+        chunks = _rechunk(instructions, TURTLE_CHUNK)
+        if backend == 'numpy':
+            parts = list(iter_turtle_segments(chunks, program, angle, step, start_pos, start_angle,
+                                              step_scale, width_scale))
+            if not parts:
+                return np.empty((0, 2, 2)), np.empty(0)
+            segments, widths = zip(*parts)
+            return np.concatenate(segments), np.concatenate(widths)
+        ops = np.concatenate([np.empty(0, dtype=np.uint8)] + [_turtle_ops(chunk, program) for chunk in chunks])
+    else:
+        ops = _turtle_ops(instructions, program)
+    if len(ops) == 0:
+        return np.empty((0, 2, 2)), np.empty(0)
+
+    table = _direction_table(angle)
+    args = (step, step_scale, width_scale, start_pos, start_angle, angle, table)
+    if backend == 'numpy':
+        return _run_numpy(ops, *args)
+    if backend == 'numba':
+        if _turtle_loop_jit is None:
+            raise ImportError("backend='numba' 需要安装 numba")
+        return _run_loop(ops, _turtle_loop_jit, *args)
+    return _run_loop(ops, _turtle_loop, *args)
+
+
+def iter_turtle_segments(chunks, program, angle, step, start_pos=(0, 0), start_angle=0,
+                         step_scale=1.0, width_scale=1.0):
+    """
+    分块解释指令流（如 iter_l_system(..., chunk_size=...) 的结果），块之间延续海龟状态
+    :param chunks: 按顺序产生指令字符串块的可迭代对象
+    :param program: compile_turtle 返回的操作码表
+    其余参数同 run_turtle
+    :return: 生成器，依次产生每块对应的 (segments, widths)
+    """
+    table = _direction_table(angle)
+    state = {}
+    for chunk in chunks:
+        ops = _turtle_ops(chunk, program)
+        if len(ops):
+            yield _run_numpy(ops, step, step_scale, width_scale, start_pos, start_angle, angle,
+                             table, state)
+
+
+def _merge_extent(extent, other):
+    """合并两个范围 (xmin, xmax, ymin, ymax)，None 表示空"""
+    if extent is None:
+        return other
+    if other is None:
+        return extent
+    return (min(extent[0], other[0]), max(extent[1], other[1]),
+            min(extent[2], other[2]), max(extent[3], other[3]))
+
+
+def _segments_extent(segments):
+    if len(segments) == 0:
+        return None
+    xs, ys = segments[:, :, 0], segments[:, :, 1]
+    return (xs.min(), xs.max(), ys.min(), ys.max())
+
+
+def instructions_extent(instructions, angle, step, start_pos=(0, 0), start_angle=0, actions=None,
+                        tree_mode=False, chunk_size=1 << 16):
+    """
+    不绘图，扫描一遍指令流得到画出图形的范围和线段数（分块处理，内存与指令长度无关）
+    :param instructions: 指令字符串，或按顺序产生字符串块的可迭代对象
+    :param actions: 符号到海龟动作的映射，见 compile_turtle
+    :param tree_mode: 见 compile_turtle
+    :param chunk_size: 指令为字符串时每块的长度
+    其余参数同 run_turtle
+    :return: (extent, count)，extent 为 (xmin, xmax, ymin, ymax)，没有线段时为 None
+    """
+    if isinstance(instructions, str):
+        text = instructions
+        instructions = (text[i:i + chunk_size] for i in range(0, len(text), chunk_size))
+    extent = None
+    count = 0
+    for segments, _ in iter_turtle_segments(instructions, compile_turtle(actions, tree_mode), angle,
+                                            step, start_pos, start_angle):
+        extent = _merge_extent(extent, _segments_extent(segments))
+        count += len(segments)
+    return extent, count
+
+
+def _balanced(text, ops):
+    """检查后继串中的压栈/出栈是否配对（任何前缀都不出现多余的出栈），ops 为符号到操作码的字典"""
+    depth = 0
+    for ch in text:
+        op = ops[ch]
+        if op in (PUSH, PUSH_TURN):
+            depth += 1
+        elif op in (POP, POP_TURN):
+            depth -= 1
+            if depth < 0:
+                return False
+    return depth == 0
+
+
+def l_system_bbox(axiom, rules, iterations, angle, step, start_pos=(0, 0), start_angle=0,
+                  actions=None, tree_mode=False):
+    """
+    不展开字符串，直接由规则计算L-System图形的范围和线段数
+    转角整除360度时朝向只有有限个取值，每个 (符号, 剩余深度, 朝向) 的展开结果
+    （净位移、净转向、相对范围、线段数）只计算一次并缓存，自相似系统的代价与字符串长度无关；
+    其他情况（转角不整除360度、含步长缩放、规则中括号不配对）退化为对指令流扫描一遍
+    :param axiom: 初始字符串
+    :param rules: 确定性规则字典
+    :param iterations: 迭代次数
+    其余参数同 instructions_extent
+    :return: (extent, count)，extent 为 (xmin, xmax, ymin, ymax)，没有线段时为 None
+    """
+    _require_deterministic(rules, "l_system_bbox")
+    program = compile_turtle(actions, tree_mode)
+    rules = {ch: successor for ch, successor in rules.items() if len(ch) == 1}
+    table = _direction_table(angle)
+    symbols = set(axiom).union(*rules.values())
+    # 出现过的符号（含规则左侧）的操作码只查一次
+    ops = {ch: program[ord(ch)] if ord(ch) < len(program) else NOP for ch in symbols.union(rules)}
+    if (table is None or any(ops[ch] == SCALE_STEP for ch in symbols)
+            or any(ops[ch] not in (DRAW, MOVE, TURN_LEFT, TURN_RIGHT, NOP) for ch in rules)
+            or not all(_balanced(successor, ops) for successor in rules.values())):
+        return instructions_extent(iter_l_system(axiom, rules, iterations, 1 << 16), angle, step,
+                                   start_pos, start_angle, actions, tree_mode)
+
+    theta0 = math.radians(start_angle)
+    directions = (complex(math.cos(theta0), math.sin(theta0)) * table).tolist()
+    period = len(directions)
+    memo = {}
+
+    def fold(children, depth, heading):
+        """在单位步长、起点为0、朝向为 heading 时解释 children 在 depth 深度下的展开"""
+        pos = 0j
+        k = heading
+        extent = None
+        count = 0
+        stack = []
+        for ch in children:
+            if depth > 0 and ch in rules:
+                key = (ch, depth, k % period)
+                if key not in memo:
+                    memo[key] = fold(rules[ch], depth - 1, k % period)
+                disp, turns, sub_extent, sub_count = memo[key]
+                if sub_extent is not None:
+                    extent = _merge_extent(extent, (sub_extent[0] + pos.real, sub_extent[1] + pos.real,
+                                                    sub_extent[2] + pos.imag, sub_extent[3] + pos.imag))
+                pos += disp
+                k += turns
+                count += sub_count
+                continue
+            op = ops[ch]
+            if op == DRAW or op == MOVE:
+                end = pos + directions[k % period]
+                if op == DRAW:
+                    extent = _merge_extent(extent, (min(pos.real, end.real), max(pos.real, end.real),
+                                                    min(pos.imag, end.imag), max(pos.imag, end.imag)))
+                    count += 1
+                pos = end
+            elif op == TURN_LEFT:
+                k += 1
+            elif op == TURN_RIGHT:
+                k -= 1
+            elif op == PUSH or op == PUSH_TURN:
+                stack.append((pos, k))
+                k += op == PUSH_TURN
+            elif op == POP or op == POP_TURN:
+                pos, k = stack.pop()
+                k -= op == POP_TURN
+        return pos, k - heading, extent, count
+
+    _, _, extent, count = fold(axiom, iterations, 0)
+    if extent is not None:
+        xs = (start_pos[0] + step * extent[0], start_pos[0] + step * extent[1])
+        ys = (start_pos[1] + step * extent[2], start_pos[1] + step * extent[3])
+        extent = (min(xs), max(xs), min(ys), max(ys))
+    return extent, count
+
+
+def rasterize_segments(segments, image, extent, margin=0.02):
+    """
+    把线段直接画入 uint8 图像（所有线段的像素采样一次性向量化计算）
+    :param segments: 形状为 (N, 2, 2) 的线段数组
+    :param image: (height, width) 的 uint8 图像，原地修改
+    :param extent: 图像对应的绘图范围 (xmin, xmax, ymin, ymax)，保持纵横比居中
+    :param margin: 四周留白占图像尺寸的比例
+    :return: image
+    """
+    if len(segments) == 0:
+        return image
+    height, width = image.shape
+    xmin, xmax, ymin, ymax = extent
+    scale = min((width - 1) * (1 - 2 * margin) / max(xmax - xmin, 1e-300),
+                (height - 1) * (1 - 2 * margin) / max(ymax - ymin, 1e-300))
+    cols = (width - 1) / 2 + scale * (segments[:, :, 0] - (xmin + xmax) / 2)
+    rows = (height - 1) / 2 - scale * (segments[:, :, 1] - (ymin + ymax) / 2)
+    d_col = cols[:, 1] - cols[:, 0]
+    d_row = rows[:, 1] - rows[:, 0]
+    # 每条线段按较长方向上的像素数采样
+    samples = np.ceil(np.maximum(np.abs(d_col), np.abs(d_row))).astype(np.int64) + 1
+    owner = np.repeat(np.arange(len(segments)), samples)
+    offset = np.arange(len(owner)) - np.repeat(np.cumsum(samples) - samples, samples)
+    t = offset / np.maximum(samples - 1, 1)[owner]
+    c = np.rint(cols[owner, 0] + t * d_col[owner]).astype(np.int64)
+    r = np.rint(rows[owner, 0] + t * d_row[owner]).astype(np.int64)
+    inside = (c >= 0) & (c < width) & (r >= 0) & (r < height)
+    image[r[inside], c[inside]] = 255
+    return image
+
+
+def render_l_system_png(axiom, rules, iterations, angle, filename, width=1024, height=1024,
+                        start_pos=(0, 0), start_angle=0, actions=None, tree_mode=False,
+                        margin=0.02, chunk_size=1 << 16, cmap='gray_r'):
+    """
+    不创建 matplotlib 图窗，按固定分辨率直接把L-System绘制到图像缓冲区并保存为PNG
+    先用 l_system_bbox 求出图形范围确定画布，再分块展开、解释并栅格化，内存与字符串长度无关
+    :param axiom: 初始字符串
+    :param rules: 确定性规则字典
+    :param iterations: 迭代次数
+    :param angle: 每次转向的角度（度）
+    :param filename: 输出文件名
+    :param width: 图像宽度（像素）
+    :param height: 图像高度（像素）
+    :param margin: 四周留白占图像尺寸的比例
+    :param chunk_size: 每次展开和解释的符号数
+    :param cmap: 颜色映射，默认白底黑线
+    其余参数同 l_system_bbox
+    :return: (height, width) 的 uint8 图像，背景为0，线条为255
+    """
+    image = np.zeros((height, width), dtype=np.uint8)
+    extent, _ = l_system_bbox(axiom, rules, iterations, angle, 1.0, start_pos, start_angle,
+                              actions, tree_mode)
+    if extent is not None:
+        program = compile_turtle(actions, tree_mode)
+        chunks = iter_l_system(axiom, rules, iterations, chunk_size)
+        for segments, _ in iter_turtle_segments(chunks, program, angle, 1.0, start_pos, start_angle):
+            rasterize_segments(segments, image, extent, margin)
+    mpimg.imsave(filename, image, cmap=cmap, vmin=0, vmax=255)
+    return image
+
+
+def l_system_segments(instructions, angle, step, start_pos=(0, 0), start_angle=0, draw_symbols="F"):
+    """
+    解释L-System指令，返回所有画出的线段（不绘图）
+    朝向以转向次数（整数）记录；转角整除360度时直接查单位向量表，不累积浮点误差
+    :param instructions: 指令字符串，或按顺序产生符号/字符串块的可迭代对象
+    :param angle: 每次转向的角度（度）
+    :param step: 每步前进的长度
+    :param start_pos: 起始坐标 (x, y)
+    :param start_angle: 起始角度（0表示向右，90表示向上）
+    :param draw_symbols: 前进并画线的符号
+    :return: 形状为 (N, 2, 2) 的数组，segments[i] = [[x0, y0], [x1, y1]]
+    """
+    actions = {'+': 'left', '-': 'right', '[': 'push', ']': 'pop'}
+    actions.update({ch: 'draw' for ch in draw_symbols})
+    segments, _ = run_turtle(instructions, compile_turtle(actions), angle, step, start_pos, start_angle)
+    return segments
+
+
+def draw_l_system(instructions, angle, step, start_pos=(0, 0), start_angle=0, savefile=None,
+                  actions=None, tree_mode=False, step_scale=1.0, width_scale=1.0, backend='auto', **kwargs):
     """
     根据L-System指令绘图
-    :param instructions: 指令字符串（如"F+F--F+F"）
+    :param instructions: 指令字符串（如"F+F--F+F"），或按顺序产生符号/字符串块的可迭代对象（如 iter_l_system 的结果）
     :param angle: 每次转向的角度（度）
     :param step: 每步前进的长度
     :param start_pos: 起始坐标 (x, y)
     :param start_angle: 起始角度（0表示向右，90表示向上）
     :param savefile: 若指定则保存为图片文件，否则直接显示
+    :param actions: 符号到海龟动作的映射（见 compile_turtle），默认为 DEFAULT_ACTIONS
+    :param tree_mode: 分形树模式：'[' 压栈后左转、']' 出栈后右转，默认动作下 '0'/'1' 画线（见 compile_turtle）
+    :param step_scale: 'scale_step' 动作的步长缩放因子
+    :param width_scale: 'change_width' 动作的线宽缩放因子
+    :param backend: 海龟解释器后端，见 run_turtle
     :param kwargs: 用于接收多余的关键字参数，忽略它们
     """
-    x, y = start_pos
-    current_angle = math.radians(start_angle)
-    stack = []
+    segments, widths = run_turtle(instructions, compile_turtle(actions, tree_mode), angle, step, start_pos,
+                                  start_angle, step_scale, width_scale, backend)
     plt.figure()
-    plt.axes().set_aspect('equal')
-    for char in instructions:
-        if char == 'F':
-            new_x = x + step * math.cos(current_angle)
-            new_y = y + step * math.sin(current_angle)
-            plt.plot([x, new_x], [y, new_y], 'k-')
-            x, y = new_x, new_y
-        elif char == '+':
-            current_angle += math.radians(angle)
-        elif char == '-':
-            current_angle -= math.radians(angle)
-        elif char == '[':
-            stack.append((x, y, current_angle))
-        elif char == ']':
-            x, y, current_angle = stack.pop()
+    ax = plt.axes()
+    ax.set_aspect('equal')
+    # 所有线段作为一个 LineCollection 绘制
+    ax.add_collection(LineCollection(segments, colors='k', linewidths=widths))
+    ax.autoscale_view()
 
     if savefile:
         plt.savefig(savefile)
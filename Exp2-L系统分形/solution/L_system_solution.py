@@ -17,6 +17,19 @@ def apply_rules(axiom, rules, iterations):
         current = ''.join(next_seq)
     return current
 
+def _direction_table(angle_deg, initial_angle):
+    """
+    Unit vectors of every reachable heading when angle_deg divides 360
+    :return: List of (dx, dy), entry k is the direction initial_angle + k * angle_deg; None otherwise
+    """
+    if angle_deg == 0:
+        return [(math.cos(math.radians(initial_angle)), math.sin(math.radians(initial_angle)))]
+    count = 360 / abs(angle_deg)
+    if abs(count - round(count)) > 1e-9:
+        return None
+    return [(math.cos(math.radians(initial_angle + k * angle_deg)),
+             math.sin(math.radians(initial_angle + k * angle_deg))) for k in range(round(count))]
+
 def draw_l_system(commands, angle_deg, step, initial_pos=(0, 0), initial_angle=90, tree_mode=False, savefile=None):
     """
     L-System plotter
@@ -29,30 +42,41 @@ def draw_l_system(commands, angle_deg, step, initial_pos=(0, 0), initial_angle=9
     :param savefile: If specified, save the plot to this file
     """
     x, y = initial_pos
-    current_angle = initial_angle
+    # Heading is tracked as an integer number of turns: initial_angle + turns * angle_deg
+    turns = 0
+    table = _direction_table(angle_deg, initial_angle)
+
+    def direction(k):
+        if table is not None:
+            return table[k % len(table)]
+        theta = math.radians(initial_angle + k * angle_deg)
+        return math.cos(theta), math.sin(theta)
+
     stack = []
     fig, ax = plt.subplots()
     for cmd in commands:
         if cmd in ('F', '0', '1'):
-            nx = x + step * math.cos(math.radians(current_angle))
-            ny = y + step * math.sin(math.radians(current_angle))
+            dx, dy = direction(turns)
+            nx = x + step * dx
+            ny = y + step * dy
             ax.plot([x, nx], [y, ny], color='green' if tree_mode else 'blue', linewidth=1.2 if tree_mode else 1)
             x, y = nx, ny
         elif cmd == 'f':
-            x += step * math.cos(math.radians(current_angle))
-            y += step * math.sin(math.radians(current_angle))
+            dx, dy = direction(turns)
+            x += step * dx
+            y += step * dy
         elif cmd == '+':
-            current_angle += angle_deg
+            turns += 1
         elif cmd == '-':
-            current_angle -= angle_deg
+            turns -= 1
         elif cmd == '[':
-            stack.append((x, y, current_angle))
+            stack.append((x, y, turns))
             if tree_mode:
-                current_angle += angle_deg
+                turns += 1
         elif cmd == ']':
-            x, y, current_angle = stack.pop()
+            x, y, turns = stack.pop()
             if tree_mode:
-                current_angle -= angle_deg
+                turns -= 1
     ax.set_aspect('equal')
     ax.axis('off')
     if savefile:
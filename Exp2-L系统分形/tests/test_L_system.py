@@ -7,12 +7,18 @@ import os
 import sys
 from pathlib import Path
 import shutil
+import math
+import numpy as np
 import matplotlib.pyplot as plt  # 添加这行导入
 
 # 添加父目录到路径，以便导入学生代码
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 #from solution.L_system_solution import apply_rules, draw_l_system  # 从solution文件夹中导入
 from L_system import apply_rules, draw_l_system                    # 从当前文件夹中导入
+from L_system import predict_lengths, iter_l_system, symbol_counts, l_system_stats
+from L_system import l_system_segments, compile_turtle, run_turtle, iter_turtle_segments
+from L_system import apply_parametric_rules, format_modules, LSystemString
+from L_system import l_system_bbox, instructions_extent, render_l_system_png
 
 
 
@@ -57,12 +63,179 @@ class TestLSystem(unittest.TestCase):
         try:
             plt.switch_backend('Agg')
             draw_l_system(instr, 45, 10, tree_mode=True)
-            self.assertTrue(True)
+            # '0'/'1' 各画一条线段
+            segments = plt.gca().collections[0].get_segments()
+            self.assertEqual(len(segments), instr.count('0') + instr.count('1'))
         except Exception as e:
             self.fail(f"绘制分形树时发生错误: {e}")
         finally:
             plt.close('all')
 
+    def test_apply_rules_values(self):
+        self.assertEqual(apply_rules("F", {"F": "F+F--F+F"}, 1), "F+F--F+F")
+        self.assertEqual(apply_rules("0", {"1": "11", "0": "1[0]0"}, 2), "11[1[0]0]1[0]0")
+        self.assertEqual(apply_rules("AB", {"A": "AB"}, 0), "AB")
+
+    def test_predict_lengths(self):
+        axiom = "0"
+        rules = {"1": "11", "0": "1[0]0"}
+        lengths = predict_lengths(axiom, rules, 6)
+        self.assertEqual(lengths, [len(apply_rules(axiom, rules, n)) for n in range(7)])
+        with self.assertRaises(ValueError):
+            apply_rules(axiom, rules, 30, max_length=10**6)
+
+    def test_iter_l_system(self):
+        axiom = "0"
+        rules = {"1": "11", "0": "1[0]0"}
+        expected = apply_rules(axiom, rules, 6)
+        self.assertEqual("".join(iter_l_system(axiom, rules, 6)), expected)
+        chunks = list(iter_l_system(axiom, rules, 6, chunk_size=10))
+        self.assertTrue(all(len(c) == 10 for c in chunks[:-1]))
+        self.assertEqual("".join(chunks), expected)
+
+    def test_draw_l_system_stream(self):
+        try:
+            plt.switch_backend('Agg')
+            draw_l_system(iter_l_system("F", {"F": "F+F--F+F"}, 2, chunk_size=7), 60, 10)
+        finally:
+            plt.close('all')
+
+    def test_symbol_counts(self):
+        axiom = "0"
+        rules = {"1": "11", "0": "1[0]0"}
+        instr = apply_rules(axiom, rules, 7)
+        counts = symbol_counts(axiom, rules, 7)
+        for ch in "01[]":
+            self.assertEqual(counts[ch], instr.count(ch))
+        stats = l_system_stats("F", {"F": "F+F--F+F"}, 20)
+        self.assertEqual(stats["segments"], 4**20)
+        self.assertEqual(stats["length"], predict_lengths("F", {"F": "F+F--F+F"}, 20)[-1])
+
+    def test_l_system_segments(self):
+        instr = apply_rules("X", {"X": "F+[[X]-X]-F[-FX]+X", "F": "FF"}, 3)
+        # 逐符号解释的参考结果
+        x, y, heading, stack, expected = 0.0, 0.0, math.radians(90), [], []
+        for ch in instr:
+            if ch == 'F':
+                nx, ny = x + 2 * math.cos(heading), y + 2 * math.sin(heading)
+                expected.append([[x, y], [nx, ny]])
+                x, y = nx, ny
+            elif ch in '+-':
+                heading += math.radians(25) * (1 if ch == '+' else -1)
+            elif ch == '[':
+                stack.append((x, y, heading))
+            elif ch == ']':
+                x, y, heading = stack.pop()
+        segments = l_system_segments(instr, 25, 2, start_angle=90)
+        self.assertEqual(segments.shape, (len(expected), 2, 2))
+        np.testing.assert_allclose(segments, expected, atol=1e-9)
+
+    def test_l_system_segments_exact_heading(self):
+        # 90度转角走1000圈正方形，朝向查表后终点精确回到起点
+        segments = l_system_segments("F+F+F+F+" * 1000, 90, 1.0)
+        self.assertEqual(segments[-1, 1, 0], 0.0)
+        self.assertEqual(segments[-1, 1, 1], 0.0)
+        self.assertTrue(np.all(np.isin(segments, [0.0, 1.0])))
+
+    def test_run_turtle_backends(self):
+        instr = apply_rules("0", {"1": "1!1", "0": "1>[0]0"}, 5) + "f+0"
+        program = compile_turtle({'0': 'draw', '1': 'draw', 'f': 'move', '+': 'left',
+                                  '[': 'push', ']': 'pop', '>': 'scale_step', '!': 'change_width'},
+                                 tree_mode=True)
+        for angle in (45, 37):
+            expected, expected_widths = run_turtle(instr, program, angle, 3, step_scale=0.7,
+                                                   width_scale=0.9, backend='python')
+            segments, widths = run_turtle(instr, program, angle, 3, step_scale=0.7,
+                                          width_scale=0.9, backend='numpy')
+            np.testing.assert_allclose(segments, expected, atol=1e-9)
+            np.testing.assert_allclose(widths, expected_widths)
+            # 符号流与分块解释结果相同
+            for backend in ('numpy', 'python'):
+                streamed = run_turtle(iter(instr), program, angle, 3, step_scale=0.7,
+                                      width_scale=0.9, backend=backend)
+                np.testing.assert_allclose(streamed[0], expected, atol=1e-9)
+                np.testing.assert_allclose(streamed[1], expected_widths)
+            chunks = (instr[i:i + 13] for i in range(0, len(instr), 13))
+            parts = list(iter_turtle_segments(chunks, program, angle, 3, step_scale=0.7, width_scale=0.9))
+            np.testing.assert_allclose(np.concatenate([p[0] for p in parts]), expected, atol=1e-9)
+        for instr in ("[F]+F", "[+F]F[-F]", "[[F]+F]-F"):
+            np.testing.assert_allclose(run_turtle(instr, compile_turtle(), 60, 1, backend='numpy')[0],
+                                       run_turtle(instr, compile_turtle(), 60, 1, backend='python')[0],
+                                       atol=1e-12)
+        with self.assertRaises(ValueError):
+            compile_turtle({'F': 'jump'})
+
+    def test_apply_rules_stochastic(self):
+        rules = {"F": [("F[+F]F", 1), ("F[-F]F", 1), ("FF", 2)]}
+        first = apply_rules("F", rules, 4, seed=7)
+        self.assertEqual(first, apply_rules("F", rules, 4, seed=7))
+        self.assertTrue(set(first) <= set("F+-[]"))
+        counts = apply_rules("F" * 20000, {"F": [("A", 1), ("B", 3)]}, 1, seed=0)
+        self.assertAlmostEqual(counts.count("B") / len(counts), 0.75, delta=0.02)
+        # 与候选临时字符冲突的码位被拒绝
+        for axiom, extra in (("F\U000F0000", {}), ("F", {"G": "\U000F0001"})):
+            with self.assertRaises(ValueError):
+                apply_rules(axiom, {**rules, **extra}, 1, seed=1)
+        # 需要唯一展开结果的函数拒绝随机规则
+        for func in (predict_lengths, symbol_counts, iter_l_system, LSystemString):
+            with self.assertRaises(ValueError):
+                func("F", rules, 2)
+
+    def test_apply_parametric_rules(self):
+        symbols, params = apply_parametric_rules("F(1)", {"F(l)": "F(l/3)+F(l/3)--F(l/3)+F(l/3)"}, 2)
+        self.assertEqual(symbols, apply_rules("F", {"F": "F+F--F+F"}, 2))
+        np.testing.assert_allclose(params[[c == 'F' for c in symbols]], 1 / 9)
+        self.assertTrue(np.all(np.isnan(params[[c != 'F' for c in symbols]])))
+        result = apply_parametric_rules("A(1)B", {"A(x)": "A(x*2)[B(x+1)]", "B": "C(7)"}, 2)
+        self.assertEqual(format_modules(*result), "A(4)[B(3)][C(7)]C(7)")
+        # 参数表达式中含函数调用（嵌套括号）
+        result = apply_parametric_rules("F(16)", {"F(l)": "F(math.sqrt(l))+F(np.maximum(l, 20))"}, 1)
+        self.assertEqual(format_modules(*result), "F(4)+F(20)")
+        for bad in ("F(1", "F(1))", "F(1,2)"):
+            with self.assertRaises(ValueError):
+                apply_parametric_rules(bad, {}, 1)
+
+    def test_l_system_string(self):
+        axiom = "X"
+        rules = {"X": "F+[[X]-X]-F[-FX]+X", "F": "FF"}
+        full = apply_rules(axiom, rules, 5)
+        rope = LSystemString(axiom, rules, 5)
+        self.assertEqual(len(rope), len(full))
+        self.assertEqual(str(rope), full)
+        self.assertEqual(rope[1234:5678], full[1234:5678])
+        self.assertEqual(rope[-7:], full[-7:])
+        self.assertEqual(rope[4321], full[4321])
+        self.assertEqual(rope.count("["), full.count("["))
+        self.assertEqual("".join(rope.chunks(100)), full)
+        deep = LSystemString(axiom, rules, 20)
+        self.assertEqual(deep.length, predict_lengths(axiom, rules, 20)[-1])
+
+    def test_l_system_bbox(self):
+        tree_actions = {'0': 'draw', '1': 'draw', '[': 'push', ']': 'pop'}
+        cases = [("F", {"F": "F+F--F+F"}, 4, 60, None, False),
+                 ("X", {"X": "F+[[X]-X]-F[-FX]+X", "F": "FF"}, 4, 25, None, False),
+                 ("0", {"1": "11", "0": "1[0]0"}, 5, 45, tree_actions, True),
+                 ("FX", {"X": "X+YF+", "Y": "-FX-Y"}, 8, 90, None, False)]
+        for axiom, rules, iterations, angle, actions, tree_mode in cases:
+            instructions = apply_rules(axiom, rules, iterations)
+            segments, _ = run_turtle(instructions, compile_turtle(actions, tree_mode), angle, 2.0, (1, -3), 30)
+            expected = (segments[:, :, 0].min(), segments[:, :, 0].max(),
+                        segments[:, :, 1].min(), segments[:, :, 1].max())
+            for extent, count in (l_system_bbox(axiom, rules, iterations, angle, 2.0, (1, -3), 30, actions, tree_mode),
+                                  instructions_extent(instructions, angle, 2.0, (1, -3), 30, actions, tree_mode, 50)):
+                self.assertEqual(count, len(segments))
+                np.testing.assert_allclose(extent, expected, atol=1e-9)
+
+    def test_render_l_system_png(self):
+        output_file = test_out_dir / "render.png"
+        image = render_l_system_png("F", {"F": "F+F--F+F"}, 4, 60, output_file, width=200, height=120)
+        self.assertEqual(image.shape, (120, 200))
+        self.assertTrue(output_file.exists())
+        # 曲线横向铺满留白以内的画布
+        columns = np.flatnonzero(image.any(axis=0))
+        self.assertLessEqual(columns[0], 5)
+        self.assertGreaterEqual(columns[-1], 194)
+
     @classmethod
     def tearDownClass(cls):
         if test_out_dir.exists():
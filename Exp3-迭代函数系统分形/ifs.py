@@ -1,6 +1,9 @@
+import math
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 import matplotlib.pyplot as plt
-import random
 
 def get_fern_params():
     """
@@ -39,34 +42,581 @@ def apply_transform(point, params):
     y_new = c * x + d * y + f
     return (x_new, y_new)
 
-def run_ifs(ifs_params, num_points=100000, num_skip=100):
+def _stack_params(ifs_params):
     """
-    运行IFS迭代生成点集
+    把参数整理为数组
+    :param ifs_params: 单个IFS的参数列表 (T, 7)，或 K 个IFS组成的参数张量 (K, T, 7)，每行为[a,b,c,d,e,f,p]；
+        变换数不同的系统可以用概率为0的行补齐
+    :return: (coeffs, cum_probs)，coeffs 形状为 (6, K, T)，依次为 a,b,c,d,e,f；cum_probs 形状为 (K, T)，
+        为各系统归一化的累积概率
+    """
+    params = np.asarray(ifs_params, dtype=np.float64)
+    if params.ndim == 2:
+        params = params[None]
+    probs = params[:, :, 6]
+    cum_probs = np.cumsum(probs, axis=1) / np.sum(probs, axis=1, keepdims=True)
+    cum_probs[:, -1] = 1.0
+    return np.moveaxis(params[:, :, :6], 2, 0).copy(), cum_probs
+
+
+# 默认跳过的点数（无法保证收敛时使用）
+DEFAULT_SKIP = 100
+
+# 点集模式下自动跳过时允许的误差（相对吸引子包围盒的尺寸）
+POINT_TOLERANCE = 1e-6
+
+
+def _active(cum_probs):
+    """概率大于0的变换，形状 (K, T)"""
+    return np.diff(cum_probs, axis=1, prepend=0.0) > 0
+
+
+def _lipschitz(coeffs):
+    """各变换线性部分的谱范数（欧氏距离下的 Lipschitz 常数），形状 (K, T)"""
+    a, b, c, d = coeffs[:4]
+    matrices = np.stack([np.stack([a, b], axis=-1), np.stack([c, d], axis=-1)], axis=-2)
+    return np.linalg.norm(matrices, ord=2, axis=(-2, -1))
+
+
+# 判断最终压缩时最多检查的变换乘积个数
+MAX_PRODUCTS = 1 << 16
+
+
+def _contraction_bound(coeffs, cum_probs):
+    """
+    各系统的压缩率 s 与常数 C，形状均为 (K,)：任意 n 个参与迭代的变换的线性部分依次复合后，谱范数不超过 C·s^n
+    s 取长度为 p 的所有乘积的最大谱范数的 p 次方根，p 从1开始增加直到 s < 1（乘积个数不超过 MAX_PRODUCTS），
+    因而单个变换不压缩、但其幂压缩的系统（如 [[0.5, 1.5], [0, 0.5]]）也能处理；
+    变换都压缩时 p = 1、C = 1，s 就是最大 Lipschitz 常数。找不到时 s 为最大 Lipschitz 常数（不小于1）
+    """
+    active = _active(cum_probs)
+    a, b, c, d = (np.where(active, v, 0.0) for v in coeffs[:4])
+    matrices = np.stack([np.stack([a, b], axis=-1), np.stack([c, d], axis=-1)], axis=-2)
+    num_systems, num_maps = active.shape
+    products = matrices
+    # peaks[r]：长度为 r 的乘积的最大谱范数
+    peaks = [np.ones(num_systems), np.linalg.norm(matrices, ord=2, axis=(-2, -1)).max(axis=1)]
+    rate = peaks[1].copy()
+    scale = np.ones(num_systems)
+    pending = rate >= 1
+    while np.any(pending) and products.shape[1] * num_maps <= MAX_PRODUCTS:
+        products = (matrices[:, :, None] @ products[:, None]).reshape(num_systems, -1, 2, 2)
+        power = len(peaks)
+        peaks.append(np.linalg.norm(products, ord=2, axis=(-2, -1)).max(axis=1))
+        # s 取大一些界仍然成立，下限避免幂零矩阵时 C 无穷大
+        candidate = np.maximum(peaks[-1] ** (1 / power), 1e-3)
+        found = pending & (candidate < 1)
+        # n = qp + r 时乘积范数不超过 s^(qp)·peaks[r] = s^n·peaks[r]/s^r
+        bound = np.max([peaks[r] / candidate ** r for r in range(power)], axis=0)
+        rate[found] = candidate[found]
+        scale[found] = bound[found]
+        pending &= ~found
+    return rate, scale
+
+
+def _contraction(coeffs, cum_probs):
+    """各系统的压缩率，小于1时保证收敛，形状 (K,)"""
+    return _contraction_bound(coeffs, cum_probs)[0]
+
+
+def _attractor_boxes(coeffs, cum_probs, directions=64, rtol=1e-9, max_iter=1000):
+    """
+    各系统吸引子的保证包围盒，形状 (K, 4)；不压缩的系统为 NaN
+    用 directions 个均匀方向上的支撑函数上界 h_j 描述包含吸引子的凸多边形。
+    吸引子上的点是 t_1 + M_1 t_2 + M_1 M_2 t_3 + ... 的极限，模不超过 R = C·max|t_i| / (1 - s)，
+    因而以原点为中心、半径 R 的圆包含吸引子，取 h_j = R 出发；
+    由 A = ∪ f_i(A) 得 h_A(u) = max_i (<u, t_i> + h_A(M_i^T u))，其中 M_i^T u 处的值用相邻两个方向的
+    非负组合给出上界，迭代并与上一轮取小，每一步都仍包含吸引子
+    """
+    active = _active(cum_probs)
+    s, scale = _contraction_bound(coeffs, cum_probs)
+    a, b, c, d, e, f = (v[:, :, None] for v in coeffs)
+    radius = np.where(active, np.hypot(coeffs[4], coeffs[5]), 0.0).max(axis=1)
+    radius = np.where(s < 1, scale * radius / np.maximum(1 - s, 1e-300), 0.0)
+    delta = 2 * np.pi / directions
+    angles = np.arange(directions) * delta
+    ux, uy = np.cos(angles), np.sin(angles)
+    # M_i^T u_j 及其在相邻两个方向上的非负分解系数
+    vx = a * ux + c * uy
+    vy = b * ux + d * uy
+    phase = np.mod(np.arctan2(vy, vx), 2 * np.pi)
+    lower = np.minimum(np.floor(phase / delta).astype(np.int64), directions - 1)
+    upper = (lower + 1) % directions
+    offset = phase - lower * delta
+    length = np.hypot(vx, vy)
+    alpha = length * np.sin(delta - offset) / np.sin(delta)
+    beta = length * np.sin(offset) / np.sin(delta)
+    shift = np.where(active[:, :, None], e * ux + f * uy, -np.inf)
+    rows = np.arange(len(s))[:, None, None]
+
+    support = np.repeat(radius[:, None], directions, axis=1)
+    for _ in range(max_iter):
+        image = (shift + alpha * support[rows, lower] + beta * support[rows, upper]).max(axis=1)
+        new = np.minimum(support, image)
+        change = np.abs(new - support).max()
+        support = new
+        if change <= rtol * max(np.abs(support).max(), 1e-300):
+            break
+    quarter = directions // 4
+    boxes = np.stack([-support[:, 2 * quarter], support[:, 0], -support[:, 3 * quarter], support[:, quarter]], axis=1)
+    boxes[s >= 1] = np.nan
+    return boxes
+
+
+def _burn_in(coeffs, cum_probs, boxes, tolerance, start=(0.0, 0.0)):
+    """
+    保证链上的点与吸引子的距离小于 tolerance 所需跳过的步数，形状 (K,)；不压缩的系统为 -1
+    n 步后起点与吸引子上某点经过同样的 n 个变换，距离至多缩小为 C·s^n 倍，
+    初始距离不超过起点到包围盒最远角点的距离
+    """
+    s, scale = _contraction_bound(coeffs, cum_probs)
+    corners_x = boxes[:, [0, 0, 1, 1]] - start[0]
+    corners_y = boxes[:, [2, 3, 2, 3]] - start[1]
+    distance = scale * np.hypot(corners_x, corners_y).max(axis=1)
+    steps = np.full(len(s), -1, dtype=np.int64)
+    for k, (rate, d0, tol) in enumerate(zip(s, distance, np.broadcast_to(tolerance, s.shape))):
+        if rate >= 1 or not np.isfinite(d0):
+            continue
+        if rate == 0 or d0 <= tol:
+            steps[k] = 1 if rate == 0 and d0 > tol else 0
+        else:
+            steps[k] = math.ceil(math.log(tol / d0) / math.log(rate))
+    return steps
+
+
+def _warn_not_contractive(s):
+    if np.any(s >= 1):
+        warnings.warn(f"IFS 中存在不压缩的变换（最大 Lipschitz 常数 {float(s.max()):.3g} >= 1，"
+                      f"变换的乘积也不压缩），"
+                      f"无法保证收敛，改用试探点估计范围并跳过 {DEFAULT_SKIP} 个点", RuntimeWarning, stacklevel=3)
+
+
+def _resolve_skip(coeffs, cum_probs, num_skip, tolerance=None):
+    """
+    num_skip 为 None 时按 tolerance 计算所有系统共用的跳过步数
+    tolerance 为 None 时取点集模式的误差：吸引子包围盒尺寸的 POINT_TOLERANCE 倍
+    """
+    if num_skip is not None:
+        return num_skip
+    s = _contraction(coeffs, cum_probs)
+    if np.any(s >= 1):
+        _warn_not_contractive(s)
+        return DEFAULT_SKIP
+    boxes = _attractor_boxes(coeffs, cum_probs)
+    if tolerance is None:
+        tolerance = POINT_TOLERANCE * np.maximum(boxes[:, 1] - boxes[:, 0], boxes[:, 3] - boxes[:, 2])
+    return int(_burn_in(coeffs, cum_probs, boxes, tolerance).max())
+
+
+def lipschitz_constants(ifs_params):
+    """
+    各变换的 Lipschitz 常数（线性部分的谱范数），全部小于1时IFS压缩，吸引子存在且唯一
+    :param ifs_params: IFS参数列表，或 (K, T, 7) 参数张量
+    :return: 形状 (T,) 的数组；参数张量时为 (K, T)
+    """
+    coeffs, _ = _stack_params(ifs_params)
+    result = _lipschitz(coeffs)
+    return result[0] if np.ndim(ifs_params) == 2 else result
+
+
+def attractor_bounds(ifs_params):
+    """
+    吸引子的保证包围盒（只考虑概率大于0的变换）
+    :param ifs_params: IFS参数列表
+    :return: (xmin, xmax, ymin, ymax)；变换及其乘积都不压缩时发出警告并返回 None
+    """
+    coeffs, cum_probs = _stack_params(ifs_params)
+    s = _contraction(coeffs, cum_probs)
+    if s[0] >= 1:
+        _warn_not_contractive(s)
+        return None
+    return tuple(float(v) for v in _attractor_boxes(coeffs, cum_probs)[0])
+
+
+def burn_in_steps(ifs_params, tolerance, start=(0.0, 0.0)):
+    """
+    从 start 出发，保证之后的点与吸引子的距离都小于 tolerance（如一个像素）所需跳过的步数
+    :param ifs_params: IFS参数列表
+    :param tolerance: 允许的距离
+    :param start: 起点
+    :return: 步数；变换及其乘积都不压缩时发出警告并返回 None
+    """
+    coeffs, cum_probs = _stack_params(ifs_params)
+    s = _contraction(coeffs, cum_probs)
+    if s[0] >= 1:
+        _warn_not_contractive(s)
+        return None
+    return int(_burn_in(coeffs, cum_probs, _attractor_boxes(coeffs, cum_probs), tolerance, start)[0])
+
+
+def _alias_tables(cum_probs):
+    """
+    Walker 别名表（Vose 构造），每个系统只需构造一次
+    :param cum_probs: 形状 (K, T) 的累积概率
+    :return: (accept, alias)，形状均为 (K, T)；抽样时均匀取格子 j，以 accept[j] 的概率取 j，否则取 alias[j]
+    """
+    num_systems, num_maps = cum_probs.shape
+    scaled = np.diff(cum_probs, axis=1, prepend=0.0) * num_maps
+    accept = np.ones((num_systems, num_maps))
+    alias = np.tile(np.arange(num_maps), (num_systems, 1))
+    for k in range(num_systems):
+        weight = scaled[k].tolist()
+        small = [j for j, w in enumerate(weight) if w < 1]
+        large = [j for j, w in enumerate(weight) if w >= 1]
+        while small and large:
+            j = small.pop()
+            g = large.pop()
+            accept[k, j] = weight[j]
+            alias[k, j] = g
+            weight[g] += weight[j] - 1
+            (small if weight[g] < 1 else large).append(g)
+        # 剩余格子的概率因舍入略偏离1，按1处理
+    return accept, alias
+
+
+def sample_transforms(ifs_params, size, seed=None):
+    """
+    按概率抽取变换序号（别名法，每个样本 O(1)，与变换数无关）
+    :param ifs_params: IFS参数列表
+    :param size: 样本数或形状
+    :param seed: 随机数种子
+    :return: int64 序号数组
+    """
+    _, cum_probs = _stack_params(ifs_params)
+    accept, alias = _alias_tables(cum_probs)
+    return _pick(accept[0], alias[0], cum_probs.shape[1], np.random.default_rng(seed).random(size))
+
+
+def _pick(accept, alias, num_maps, u, offset=0):
+    """
+    查别名表：一个 [0,1) 均匀随机数同时决定格子和是否取别名
+    :param accept: 拼接为一维的接受概率表
+    :param alias: 拼接为一维的别名表（为拼接后的序号）
+    :param num_maps: 每个系统的变换数
+    :param u: 均匀随机数数组
+    :param offset: 各随机数所属系统的表在拼接表中的起点
+    """
+    u = np.asarray(u) * num_maps
+    cell = np.minimum(u.astype(np.int64), num_maps - 1)
+    u -= cell
+    cell += offset
+    return np.where(u < accept[cell], cell, alias[cell])
+
+
+def _chaos_blocks(coeffs, cum_probs, lanes, num_steps, num_skip, rng, block_size=1 << 18):
+    """
+    K 个系统、每个 lanes 条独立链并行的混沌游戏：每一步所有链同时前进一步
+    变换序号按块一次抽取（别名法），系数按序号一次取出，逐步只剩数组算术
+    :return: 生成器，依次产生 (x, y)，形状均为 (块内步数, K, lanes)，已跳过前 num_skip 步
+    """
+    num_systems, num_maps = cum_probs.shape
+    flat_coeffs = coeffs.reshape(6, -1)
+    accept, alias = _alias_tables(cum_probs)
+    # 各系统的表拼接为一维，别名也换成拼接后的序号
+    flat_accept = accept.ravel()
+    flat_alias = (alias + num_maps * np.arange(num_systems)[:, None]).ravel()
+    base = num_maps * np.arange(num_systems)[:, None]
+    block_steps = max(1, block_size // (num_systems * lanes))
+    x = np.zeros((num_systems, lanes))
+    y = np.zeros((num_systems, lanes))
+    total = num_skip + num_steps
+    done = 0
+    while done < total:
+        count = min(block_steps, total - done)
+        choice = _pick(flat_accept, flat_alias, num_maps, rng.random((count, num_systems, lanes)), base)
+        a, b, c, d, e, f = flat_coeffs[:, choice]
+        xs = np.empty((count, num_systems, lanes))
+        ys = np.empty((count, num_systems, lanes))
+        for i in range(count):
+            x, y = a[i] * x + b[i] * y + e[i], c[i] * x + d[i] * y + f[i]
+            xs[i] = x
+            ys[i] = y
+        first = max(num_skip - done, 0)
+        done += count
+        if first < count:
+            yield xs[first:], ys[first:]
+
+
+def _per_system(values, remaining):
+    """把 (步数, K, lanes) 的块整理为 (K, 点数)，每个系统最多保留 remaining 个点"""
+    return values.transpose(1, 0, 2).reshape(values.shape[1], -1)[:, :remaining]
+
+
+def _batch_points(coeffs, cum_probs, num_points, num_skip, lanes, rng):
+    """为每个系统产生 num_points 个点，返回形状 (K, num_points, 2)"""
+    lanes = max(1, min(lanes, num_points))
+    num_steps = -(-num_points // lanes)
+    points = np.empty((cum_probs.shape[0], num_points, 2))
+    filled = 0
+    for xs, ys in _chaos_blocks(coeffs, cum_probs, lanes, num_steps, num_skip, rng):
+        xs = _per_system(xs, num_points - filled)
+        ys = _per_system(ys, num_points - filled)
+        n = xs.shape[1]
+        points[:, filled:filled + n, 0] = xs
+        points[:, filled:filled + n, 1] = ys
+        filled += n
+    return points
+
+
+def chaos_game(ifs_params, num_points=100000, num_skip=None, lanes=1024, seed=None):
+    """
+    向量化的混沌游戏：lanes 条链同时迭代，每条链各自跳过前 num_skip 个点
     :param ifs_params: IFS参数列表
     :param num_points: 总点数
-    :param num_skip: 跳过前n个点
-    :return: 生成的点坐标数组
+    :param num_skip: 每条链跳过的点数，None 表示跳到与吸引子的距离小于其尺寸的 POINT_TOLERANCE 倍
+    :param lanes: 并行的链数
+    :param seed: 随机数种子
+    :return: 形状为 (num_points, 2) 的点坐标数组
+    """
+    coeffs, cum_probs = _stack_params(ifs_params)
+    num_skip = _resolve_skip(coeffs, cum_probs, num_skip)
+    return _batch_points(coeffs, cum_probs, num_points, num_skip, lanes, np.random.default_rng(seed))[0]
+
+
+def _pilot_extent(coeffs, cum_probs, num_skip, rng, num_points=20000, pad=0.05, lanes=64):
+    """用少量试探点估计各系统吸引子的范围，四周各放宽 pad 比例，返回形状 (K, 4)"""
+    num_steps = -(-num_points // lanes)
+    bounds = np.full((cum_probs.shape[0], 4), np.inf)
+    bounds[:, 1::2] = -np.inf
+    for xs, ys in _chaos_blocks(coeffs, cum_probs, lanes, num_steps, num_skip, rng):
+        np.minimum(bounds[:, 0], xs.min(axis=(0, 2)), out=bounds[:, 0])
+        np.maximum(bounds[:, 1], xs.max(axis=(0, 2)), out=bounds[:, 1])
+        np.minimum(bounds[:, 2], ys.min(axis=(0, 2)), out=bounds[:, 2])
+        np.maximum(bounds[:, 3], ys.max(axis=(0, 2)), out=bounds[:, 3])
+    margin = np.maximum(bounds[:, 1::2] - bounds[:, 0::2], 1e-12) * pad
+    bounds[:, 0::2] -= margin
+    bounds[:, 1::2] += margin
+    return bounds
+
+
+def _accumulate(hist, xs, ys, extents):
+    """
+    把一批点计入各系统的直方图（原地修改），范围外的点丢弃
+    :param hist: 形状 (K, 高, 宽) 的直方图
+    :param xs: 形状 (K, n) 的横坐标，ys 同
+    :param extents: 形状 (K, 4) 的范围
+    """
+    num_systems, height, width = hist.shape
+    xmin, xmax, ymin, ymax = (column[:, None] for column in extents.T)
+    col = np.floor((xs - xmin) * (width / (xmax - xmin))).astype(np.int64)
+    row = np.floor((ys - ymin) * (height / (ymax - ymin))).astype(np.int64)
+    # 恰好落在上/右边界的点计入最后一格
+    col[xs == xmax] = width - 1
+    row[ys == ymax] = height - 1
+    inside = (col >= 0) & (col < width) & (row >= 0) & (row < height)
+    flat = ((np.arange(num_systems)[:, None] * height + row) * width + col)[inside]
+    if hist.size <= len(flat):
+        hist += np.bincount(flat, minlength=hist.size).reshape(hist.shape)
+    else:
+        # 画布比一批点大时，bincount 每批都要分配并累加整张画布，改为只更新命中的格子
+        np.add.at(hist.reshape(-1), flat, 1)
+
+
+def _histogram_shard(coeffs, cum_probs, num_points, shape, extents, num_skip, lanes, rng):
+    """用一个随机数流为每个系统产生 num_points 个点并计入新的直方图"""
+    hist = np.zeros((cum_probs.shape[0],) + shape, dtype=np.int64)
+    if num_points <= 0:
+        return hist
+    lanes = max(1, min(lanes, num_points))
+    num_steps = -(-num_points // lanes)
+    remaining = num_points
+    for xs, ys in _chaos_blocks(coeffs, cum_probs, lanes, num_steps, num_skip, rng):
+        xs = _per_system(xs, remaining)
+        ys = _per_system(ys, remaining)
+        remaining -= xs.shape[1]
+        _accumulate(hist, xs, ys, extents)
+    return hist
+
+
+def _histogram_worker(args):
+    """进程池中执行的分片任务，随机数流由传入的 SeedSequence 决定"""
+    coeffs, cum_probs, num_points, shape, extents, num_skip, lanes, seed_seq = args
+    return _histogram_shard(coeffs, cum_probs, num_points, shape, extents, num_skip, lanes,
+                            np.random.default_rng(seed_seq))
+
+
+def _padded_boxes(coeffs, cum_probs, width, height):
+    """保证包围盒四周各留半个像素，作为画布范围"""
+    boxes = _attractor_boxes(coeffs, cum_probs)
+    pad = np.maximum(boxes[:, 1::2] - boxes[:, 0::2], 1e-12) / (2 * np.array([width, height]))
+    boxes[:, 0::2] -= pad
+    boxes[:, 1::2] += pad
+    return boxes
+
+
+def _batch_histogram(coeffs, cum_probs, num_points, bins, extent, num_skip, lanes, seed, workers):
+    """ifs_histogram 和 run_ifs_batch 共用的直方图实现，返回 (K 个直方图, 形状 (K, 4) 的范围)"""
+    num_systems = cum_probs.shape[0]
+    width, height = (bins, bins) if np.isscalar(bins) else bins
+    shape = (height, width)
+    if workers <= 1:
+        rng = np.random.default_rng(seed)
+        pilot_rng = rng
+    else:
+        pilot_seq, *worker_seqs = np.random.SeedSequence(seed).spawn(workers + 1)
+        pilot_rng = np.random.default_rng(pilot_seq)
+    s = _contraction(coeffs, cum_probs)
+    if extent is not None:
+        extents = np.array(np.broadcast_to(np.asarray(extent, dtype=np.float64), (num_systems, 4)))
+    elif np.all(s < 1):
+        extents = _padded_boxes(coeffs, cum_probs, width, height)
+    else:
+        _warn_not_contractive(s)
+        extents = _pilot_extent(coeffs, cum_probs, DEFAULT_SKIP if num_skip is None else num_skip, pilot_rng)
+    if num_skip is None:
+        pixel = np.minimum((extents[:, 1] - extents[:, 0]) / width, (extents[:, 3] - extents[:, 2]) / height)
+        num_skip = DEFAULT_SKIP if np.any(s >= 1) else int(_burn_in(
+            coeffs, cum_probs, _attractor_boxes(coeffs, cum_probs), pixel).max())
+    if workers <= 1:
+        return _histogram_shard(coeffs, cum_probs, num_points, shape, extents, num_skip, lanes, rng), extents
+
+    counts = [num_points // workers + (i < num_points % workers) for i in range(workers)]
+    tasks = [(coeffs, cum_probs, n, shape, extents, num_skip, lanes, seq)
+             for n, seq in zip(counts, worker_seqs)]
+    hist = np.zeros((num_systems,) + shape, dtype=np.int64)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for part in pool.map(_histogram_worker, tasks):
+            hist += part
+    return hist, extents
+
+
+def ifs_histogram(ifs_params, num_points=1000000, bins=512, extent=None, num_skip=None,
+                  lanes=1024, seed=None, workers=1):
+    """
+    混沌游戏产生的点直接计入固定分辨率的二维命中次数直方图，内存与点数无关
+    workers 大于1时把点数均分给多个进程，各进程使用由 SeedSequence(seed).spawn 派生的独立随机数流，
+    各自的部分直方图相加合并；给定 seed 和 workers 时结果确定
+    :param ifs_params: IFS参数列表
+    :param num_points: 总点数
+    :param bins: 直方图分辨率，整数或 (宽, 高)
+    :param extent: 直方图覆盖的范围 (xmin, xmax, ymin, ymax)，默认为吸引子的保证包围盒
+        （存在不压缩的变换时由试探点估计）
+    :param num_skip: 每条链跳过的点数，None 表示跳到与吸引子的距离小于一个像素
+    :param lanes: 每个进程中并行的链数
+    :param seed: 随机数种子
+    :param workers: 进程数
+    :return: (hist, extent)，hist 为形状 (高, 宽) 的 int64 数组，第0行对应 ymin
+    """
+    coeffs, cum_probs = _stack_params(ifs_params)
+    hist, extents = _batch_histogram(coeffs, cum_probs, num_points, bins, extent, num_skip, lanes,
+                                     seed, workers)
+    return hist[0], tuple(float(v) for v in extents[0])
+
+
+def run_ifs_batch(param_tensor, num_points=100000, num_skip=None, seed=None, bins=None, extent=None,
+                  workers=1, lanes=64):
+    """
+    在同一个向量化混沌游戏中同时运行 K 个IFS，用于参数扫描
+    :param param_tensor: 形状为 (K, T, 7) 的参数张量，变换数不足 T 的系统用概率为0的行补齐
+    :param num_points: 每个系统的点数
+    :param num_skip: 每条链跳过的点数，None 表示按各系统中最慢收敛的一个自动确定
+    :param seed: 随机数种子
+    :param bins: 给出时返回各系统的密度直方图，见 ifs_histogram
+    :param extent: 直方图范围，可为所有系统共用的 (xmin, xmax, ymin, ymax) 或形状 (K, 4) 的数组，默认逐个估计
+    :param workers: 直方图模式下的进程数
+    :param lanes: 每个系统并行的链数
+    :return: 形状为 (K, num_points, 2) 的点坐标数组；给出 bins 时为 (hists, extents)，
+        hists 形状为 (K, 高, 宽)，extents 形状为 (K, 4)
+    """
+    coeffs, cum_probs = _stack_params(param_tensor)
+    if bins is not None:
+        return _batch_histogram(coeffs, cum_probs, num_points, bins, extent, num_skip, lanes, seed, workers)
+    num_skip = _resolve_skip(coeffs, cum_probs, num_skip)
+    return _batch_points(coeffs, cum_probs, num_points, num_skip, lanes, np.random.default_rng(seed))
+
+
+def tone_map(hist, gamma=1.0):
+    """
+    对数密度映射：log(1+n) / log(1+max)，再做 gamma 校正
+    :param hist: 命中次数直方图
+    :param gamma: gamma 值，小于1时增强暗部
+    :return: 取值在 [0, 1] 的 float64 图像
+    """
+    peak = hist.max()
+    if peak == 0:
+        return np.zeros(hist.shape)
+    image = np.log1p(hist) / np.log1p(peak)
+    return image ** gamma if gamma != 1.0 else image
+
+
+def _fixed_points(coeffs):
+    """
+    各变换的不动点（I - M 奇异的变换跳过），它们都在吸引子上
+    :param coeffs: 形状 (6, T) 的系数，只应包含概率大于0的变换
     """
-    # 提取概率并归一化
-    probs = [param[6] for param in ifs_params]
-    probs = np.cumsum(probs) / np.sum(probs)
-    
     points = []
-    point = (0, 0)  # 初始点
-    
-    for i in range(num_points + num_skip):
-        # 根据概率选择变换
-        r = random.random()
-        for idx, prob in enumerate(probs):
-            if r <= prob:
-                point = apply_transform(point, ifs_params[idx])
-                break
-        
-        # 跳过前num_skip个点
-        if i >= num_skip:
-            points.append(point)
-    
-    return np.array(points)
+    for a, b, c, d, e, f in coeffs.T:
+        det = (1 - a) * (1 - d) - b * c
+        if abs(det) > 1e-12:
+            points.append((((1 - d) * e + b * f) / det, ((1 - a) * f + c * e) / det))
+    return np.array(points).reshape(-1, 2)
+
+
+def render_ifs_deterministic(ifs_params, bins=512, extent=None, supersample=4):
+    """
+    确定性算法绘制吸引子：从各变换的不动点出发，反复把所有变换作用于新占据格子中的点，直到不再出现新格子
+    每个格子保存一个精确的吸引子上的点（不动点经变换复合得到），变换作用于这个点而不是格子中心，
+    不会累积取整误差，标记的格子都与吸引子相交；占据状态记录在 supersample 倍细分的网格上，
+    每个细格各自保存一个点，输出时按粗格合并，以减少漏掉的格子。
+    每轮只变换上一轮新增的点（前沿），结果无噪声，代价与占据的细格数成正比，
+    与各变换的概率无关（概率很小的蕨类茎干也能一次画全）
+    :param ifs_params: IFS参数列表（概率只用于排除概率为0的补齐行）
+    :param bins: 分辨率，整数或 (宽, 高)
+    :param extent: 覆盖范围 (xmin, xmax, ymin, ymax)，默认为吸引子的保证包围盒
+    :param supersample: 每个输出格子在每个方向上细分的份数
+    :return: (mask, extent)，mask 为形状 (高, 宽) 的布尔数组，第0行对应 ymin
+    """
+    coeffs, cum_probs = _stack_params(ifs_params)
+    width, height = (bins, bins) if np.isscalar(bins) else bins
+    if extent is None and np.all(_contraction(coeffs, cum_probs) < 1):
+        extent = _padded_boxes(coeffs, cum_probs, width, height)[0]
+    elif extent is None:
+        _warn_not_contractive(_contraction(coeffs, cum_probs))
+        extent = _pilot_extent(coeffs, cum_probs, DEFAULT_SKIP, np.random.default_rng(0))[0]
+    # 概率为0的行只是补齐，不属于IFS
+    coeffs = coeffs[:, 0, _active(cum_probs)[0]]
+    xmin, xmax, ymin, ymax = extent
+    fine_w = width * supersample
+    fine_h = height * supersample
+    cell_w = (xmax - xmin) / fine_w
+    cell_h = (ymax - ymin) / fine_h
+    a, b, c, d, e, f = (row[:, None] for row in coeffs)
+
+    occupied = np.zeros(fine_w * fine_h, dtype=bool)
+    xs, ys = _fixed_points(coeffs).T
+    while len(xs):
+        col = np.floor((xs - xmin) / cell_w).astype(np.int64)
+        row = np.floor((ys - ymin) / cell_h).astype(np.int64)
+        cells = row * fine_w + col
+        # 只保留落在范围内、且所在细格尚未占据的点，每个新细格保留一个点
+        new = (col >= 0) & (col < fine_w) & (row >= 0) & (row < fine_h)
+        new[new] = ~occupied[cells[new]]
+        cells, first = np.unique(cells[new], return_index=True)
+        xs = xs[new][first]
+        ys = ys[new][first]
+        occupied[cells] = True
+        xs, ys = (a * xs + b * ys + e).ravel(), (c * xs + d * ys + f).ravel()
+    mask = occupied.reshape(height, supersample, width, supersample).any(axis=(1, 3))
+    return mask, tuple(float(v) for v in extent)
+
+
+def run_ifs(ifs_params, num_points=100000, num_skip=None, seed=None, bins=None, extent=None,
+            workers=1):
+    """
+    运行IFS迭代生成点集
+    :param ifs_params: IFS参数列表
+    :param num_points: 总点数
+    :param num_skip: 跳过前n个点，None 表示由压缩率自动确定
+    :param seed: 随机数种子
+    :param bins: 给出时不返回点集，而是返回密度直方图，见 ifs_histogram
+    :param extent: 直方图范围，见 ifs_histogram
+    :param workers: 直方图模式下的进程数，见 ifs_histogram
+    :return: 生成的点坐标数组；给出 bins 时为 (hist, extent)
+    """
+    if bins is not None:
+        return ifs_histogram(ifs_params, num_points, bins, extent, num_skip, seed=seed, workers=workers)
+    return chaos_game(ifs_params, num_points, num_skip, seed=seed)
+
 
 def plot_ifs(points, title="IFS Fractal", color='green', figsize=(8, 10)):
     """
@@ -83,6 +633,28 @@ def plot_ifs(points, title="IFS Fractal", color='green', figsize=(8, 10)):
     plt.axis('off')
     plt.show()
 
+def plot_ifs_density(hist, extent, title="IFS Fractal", cmap='Greens', gamma=1.0, figsize=(8, 10),
+                     save_path=None):
+    """
+    以对数密度绘制直方图
+    :param hist: ifs_histogram 返回的直方图
+    :param extent: 直方图范围
+    :param title: 图像标题
+    :param cmap: 颜色映射
+    :param gamma: 见 tone_map
+    :param figsize: 图像大小
+    :param save_path: 给出时直接把色调映射后的图像按直方图分辨率保存为PNG，不创建图窗
+    """
+    image = tone_map(hist, gamma)
+    if save_path:
+        plt.imsave(save_path, image, cmap=cmap, origin='lower', vmin=0, vmax=1)
+        return
+    plt.figure(figsize=figsize)
+    plt.imshow(image, cmap=cmap, origin='lower', extent=extent, vmin=0, vmax=1)
+    plt.title(title)
+    plt.axis('off')
+    plt.show()
+
 if __name__ == "__main__":
     # 生成并绘制巴恩斯利蕨
     fern_params = get_fern_params()
@@ -25,6 +25,26 @@ def apply_transform(point, params):
     a, b, c, d, e, f, _ = params
     return a*x + b*y + e, c*x + d*y + f
 
+def _alias_table(probs):
+    """
+    Walker 别名表（Vose 构造）
+    抽样时均匀取格子 j，以 accept[j] 的概率取 j，否则取 alias[j]，每次抽样 O(1)
+    """
+    num_maps = len(probs)
+    weight = (np.asarray(probs, dtype=float) / np.sum(probs) * num_maps).tolist()
+    accept = np.ones(num_maps)
+    alias = np.arange(num_maps)
+    small = [j for j, w in enumerate(weight) if w < 1]
+    large = [j for j, w in enumerate(weight) if w >= 1]
+    while small and large:
+        j = small.pop()
+        g = large.pop()
+        accept[j] = weight[j]
+        alias[j] = g
+        weight[g] += weight[j] - 1
+        (small if weight[g] < 1 else large).append(g)
+    return accept, alias
+
 def run_ifs(ifs_params, num_points=100000, num_skip=100):
     """
     运行IFS迭代生成点集
@@ -33,9 +53,12 @@ def run_ifs(ifs_params, num_points=100000, num_skip=100):
     :param num_skip: 跳过前n个点(避免初始不稳定)
     :return: 生成的点坐标数组
     """
-    # 提取概率用于随机选择
+    # 提取概率用于随机选择，用别名表一次抽出所有变换序号
     probs = [p[-1] for p in ifs_params]
-    indices = np.arange(len(ifs_params))
+    accept, alias = _alias_table(probs)
+    u = np.random.random(num_points + num_skip) * len(probs)
+    cell = np.minimum(u.astype(np.int64), len(probs) - 1)
+    choices = np.where(u - cell < accept[cell], cell, alias[cell])
     
     # 初始化
     point = (0.5, 0)  # 初始点
@@ -44,7 +67,7 @@ def run_ifs(ifs_params, num_points=100000, num_skip=100):
     # 迭代生成点
     for i in range(num_points + num_skip):
         # 随机选择变换
-        idx = np.random.choice(indices, p=probs)
+        idx = choices[i]
         point = apply_transform(point, ifs_params[idx])
         
         # 跳过初始不稳定点
@@ -1,4 +1,5 @@
 import unittest
+import warnings
 import os
 import sys
 from pathlib import Path
@@ -9,6 +10,8 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # 导入学生代码或参考代码
 from ifs import get_fern_params, get_tree_params, apply_transform, run_ifs
+from ifs import chaos_game, ifs_histogram, tone_map, render_ifs_deterministic, run_ifs_batch
+from ifs import lipschitz_constants, attractor_bounds, burn_in_steps, sample_transforms
 #from solution.ifs_solution import get_fern_params, get_tree_params, apply_transform, run_ifs
 
 class TestIFS(unittest.TestCase):
@@ -55,5 +58,123 @@ class TestIFS(unittest.TestCase):
         self.assertIsInstance(points, np.ndarray)
         self.assertEqual(points.shape, (1000, 2))
 
+    def test_chaos_game(self):
+        # 两个压缩一半的变换，吸引子为 x 轴上的 [0, 2]
+        test_params = [
+            [0.5, 0, 0, 0.5, 0, 0, 0.5],
+            [0.5, 0, 0, 0.5, 1, 0, 0.5]
+        ]
+        points = chaos_game(test_params, num_points=1001, lanes=7, seed=3)
+        self.assertEqual(points.shape, (1001, 2))
+        self.assertTrue(np.all((points[:, 0] >= 0) & (points[:, 0] <= 2)))
+        self.assertTrue(np.all(points[:, 1] == 0))
+        self.assertAlmostEqual(points[:, 0].mean(), 1.0, delta=0.1)
+        np.testing.assert_array_equal(run_ifs(get_fern_params(), 500, seed=5),
+                                      run_ifs(get_fern_params(), 500, seed=5))
+
+    def test_ifs_histogram(self):
+        hist, extent = run_ifs(get_fern_params(), num_points=20000, seed=1, bins=(40, 80))
+        self.assertEqual(hist.shape, (80, 40))
+        self.assertEqual(hist.sum(), 20000)
+        fixed, _ = ifs_histogram(get_fern_params(), 20000, bins=10, extent=(-3, 3, 0, 5), seed=1)
+        self.assertLess(fixed.sum(), 20000)  # 超出范围的点被丢弃
+        # 画布大于一批点时走只更新命中格子的路径，结果与逐点统计相同
+        points = chaos_game(get_fern_params(), 5000, num_skip=50, seed=3)
+        large, _ = ifs_histogram(get_fern_params(), 5000, bins=(300, 400), extent=(-3, 3, -1, 11),
+                                 num_skip=50, seed=3)
+        expected, _, _ = np.histogram2d(points[:, 1], points[:, 0], bins=(400, 300), range=((-1, 11), (-3, 3)))
+        np.testing.assert_array_equal(large, expected)
+        image = tone_map(hist)
+        self.assertAlmostEqual(image.max(), 1.0)
+        self.assertEqual(image.min(), 0.0)
+
+    def test_ifs_histogram_workers(self):
+        first = ifs_histogram(get_tree_params(), 30001, bins=32, seed=7, workers=2)
+        second = ifs_histogram(get_tree_params(), 30001, bins=32, seed=7, workers=2)
+        np.testing.assert_array_equal(first[0], second[0])
+        self.assertEqual(first[1], second[1])
+        self.assertEqual(first[0].sum(), 30001)
+
+    def test_render_ifs_deterministic(self):
+        test_params = [
+            [0.5, 0, 0, 0.5, 0, 0, 0.5],
+            [0.5, 0, 0, 0.5, 1, 0, 0.5]
+        ]
+        mask, _ = render_ifs_deterministic(test_params, bins=(30, 2), extent=(-0.5, 2.5, -1, 1))
+        self.assertTrue(mask[1, 5:25].all())
+        self.assertFalse(mask[0].any())
+        self.assertFalse(mask[1, :5].any() or mask[1, 26:].any())
+        # 概率为0的补齐行不参与绘制
+        padded, _ = render_ifs_deterministic(test_params + [[0, 0, 0, 0, 0, 0, 0]], bins=(30, 2),
+                                             extent=(-0.5, 2.5, -1, 1))
+        np.testing.assert_array_equal(padded, mask)
+        shifted = [[0.5, 0, 0, 0.5, 1, 0, 0.5], [0.5, 0, 0, 0.5, 2, 0, 0.5], [0, 0, 0, 0, 0, 0, 0]]
+        mask, _ = render_ifs_deterministic(shifted, bins=(30, 2), extent=(-0.5, 4.5, -1, 1))
+        self.assertFalse(mask[1, :14].any())
+        # 与大量随机点得到的直方图基本一致
+        mask, extent = render_ifs_deterministic(get_fern_params(), bins=(100, 200))
+        hist, _ = ifs_histogram(get_fern_params(), 1000000, bins=(100, 200), extent=extent, seed=2)
+        hit = hist > 0
+        self.assertGreater((mask & hit).sum(), 0.98 * hit.sum())
+        # 多出来的格子与直方图的距离不超过一格
+        padded = np.pad(hit, 1)
+        near = np.zeros_like(hit)
+        for i in range(3):
+            for j in range(3):
+                near |= padded[i:i + hit.shape[0], j:j + hit.shape[1]]
+        self.assertFalse((mask & ~near).any())
+
+    def test_run_ifs_batch(self):
+        # 树只有3个变换，用概率为0的行补齐到4个
+        tensor = np.zeros((2, 4, 7))
+        tensor[0] = get_fern_params()
+        tensor[1, :3] = get_tree_params()
+        points = run_ifs_batch(tensor, num_points=20000, seed=1)
+        self.assertEqual(points.shape, (2, 20000, 2))
+        for k, params in enumerate([get_fern_params(), get_tree_params()]):
+            single = run_ifs(params, num_points=20000, seed=2)
+            np.testing.assert_allclose(points[k].mean(axis=0), single.mean(axis=0), atol=0.1)
+        hists, extents = run_ifs_batch(tensor, num_points=5000, seed=1, bins=(16, 32))
+        self.assertEqual(hists.shape, (2, 32, 16))
+        self.assertEqual(extents.shape, (2, 4))
+        np.testing.assert_array_equal(hists.sum(axis=(1, 2)), [5000, 5000])
+        _, extents = run_ifs_batch(tensor, num_points=100, seed=1, bins=8, extent=(-3, 3, 0, 10))
+        extents[1] = 0  # 返回的范围是独立可写的数组
+        np.testing.assert_array_equal(extents[0], [-3, 3, 0, 10])
+
+    def test_ifs_analysis(self):
+        fern = get_fern_params()
+        np.testing.assert_allclose(lipschitz_constants(fern)[:2], [0.16, np.hypot(0.85, 0.04)])
+        xmin, xmax, ymin, ymax = attractor_bounds(fern)
+        points = run_ifs(fern, num_points=100000, num_skip=200, seed=1)
+        self.assertTrue(np.all((points[:, 0] >= xmin) & (points[:, 0] <= xmax)))
+        self.assertTrue(np.all((points[:, 1] >= ymin) & (points[:, 1] <= ymax)))
+        # 包围盒接近实际范围
+        self.assertLess(xmax - xmin, 1.05 * np.ptp(points[:, 0]))
+        self.assertLess(ymax - ymin, 1.05 * np.ptp(points[:, 1]))
+        steps = burn_in_steps(fern, 1e-3)
+        self.assertGreater(steps, burn_in_steps(fern, 1e-1))
+        self.assertLess(steps, 100)
+        expanding = [[1.1, 0, 0, 0.5, 0, 0, 0.5], [0.5, 0, 0, 0.5, 1, 0, 0.5]]
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            self.assertIsNone(attractor_bounds(expanding))
+        self.assertTrue(issubclass(caught[0].category, RuntimeWarning))
+        # 单个变换不压缩、但其幂压缩的系统仍能给出包围盒和跳过步数
+        shear = [[0.5, 1.5, 0, 0.5, 0, 0, 0.5], [0.5, 0, 0, 0.5, 0, 1, 0.5]]
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            xmin, xmax, ymin, ymax = attractor_bounds(shear)
+            self.assertIsNotNone(burn_in_steps(shear, 1e-3))
+        points = run_ifs(shear, num_points=100000, num_skip=200, seed=1)
+        self.assertTrue(np.all((points[:, 0] >= xmin) & (points[:, 0] <= xmax)))
+        self.assertTrue(np.all((points[:, 1] >= ymin) & (points[:, 1] <= ymax)))
+
+    def test_sample_transforms(self):
+        params = [[0.5, 0, 0, 0.5, 0, 0, p] for p in (0.1, 0.0, 0.6, 0.3)]
+        counts = np.bincount(sample_transforms(params, 200000, seed=1), minlength=4) / 200000
+        self.assertEqual(counts[1], 0)
+        np.testing.assert_allclose(counts, [0.1, 0.0, 0.6, 0.3], atol=0.005)
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -1,12 +1,86 @@
 import numpy as np
 import matplotlib.pyplot as plt
 
-def generate_mandelbrot(width=800, height=800, max_iter=100):
+# 周期检测时认为轨道回到已记录点的距离平方阈值
+PERIOD_TOLERANCE = 1e-24
+
+
+def in_main_components(c):
+    """
+    主心形区和周期2圆盘的闭式判定，其中的点都属于Mandelbrot集
+    :param c: 复数数组
+    :return: 布尔数组
+    """
+    x, y = c.real, c.imag
+    y2 = y * y
+    q = (x - 0.25) ** 2 + y2
+    return (q * (q + (x - 0.25)) <= 0.25 * y2) | ((x + 1) ** 2 + y2 <= 0.0625)
+
+
+def escape_time(z0, c, max_iter=100, periodicity=False):
+    """
+    逃逸时间：迭代 z -> z^2 + c，返回每个点满足 |z| <= 2 的迭代次数（即首次逃逸前的步数，最多 max_iter）
+    只对尚未逃逸的点维护一个紧凑的下标列表，点逃逸后立即从列表中移除，
+    计算量与“存活点数 x 迭代次数”成正比；用 |z|^2 <= 4 判断，不开平方
+    :param z0: 初始值数组
+    :param c: 参数，复数或与 z0 同形状的数组
+    :param max_iter: 最大迭代次数
+    :param periodicity: 为True时做周期检测：每隔一段（长度逐次加倍）记录一次 z，轨道回到记录点
+        （距离平方小于 PERIOD_TOLERANCE）时判定为不逃逸，直接记为 max_iter
+    :return: 与 z0 同形状的 int32 数组
+    """
+    z0 = np.asarray(z0, dtype=np.complex128)
+    counts = np.full(z0.size, max_iter, dtype=np.int32)
+    live = np.arange(z0.size)
+    zr = z0.real.ravel().copy()
+    zi = z0.imag.ravel().copy()
+    c = np.asarray(c, dtype=np.complex128)
+    if c.ndim:
+        cr = np.broadcast_to(c, z0.shape).real.ravel().copy()
+        ci = np.broadcast_to(c, z0.shape).imag.ravel().copy()
+    else:
+        cr, ci = c.real, c.imag
+
+    saved_r, saved_i = zr, zi
+    next_save = 8
+    for j in range(max_iter):
+        zr2 = zr * zr
+        zi2 = zi * zi
+        escaped = zr2 + zi2 > 4
+        if periodicity and j:
+            # 进入周期轨道的点不会逃逸，与逃逸的点一起移出列表
+            cyclic = (zr - saved_r) ** 2 + (zi - saved_i) ** 2 < PERIOD_TOLERANCE
+            cyclic &= ~escaped
+            settled = escaped | cyclic
+        else:
+            settled = escaped
+        if settled.any():
+            counts[live[escaped]] = j
+            keep = ~settled
+            live = live[keep]
+            zr, zi, zr2, zi2 = zr[keep], zi[keep], zr2[keep], zi2[keep]
+            if periodicity:
+                saved_r, saved_i = saved_r[keep], saved_i[keep]
+            if c.ndim:
+                cr, ci = cr[keep], ci[keep]
+            if not len(live):
+                break
+        if periodicity and j == next_save:
+            saved_r, saved_i = zr, zi
+            next_save *= 2
+        zi = 2 * zr * zi + ci
+        zr = zr2 - zi2 + cr
+    return counts.reshape(z0.shape)
+
+
+def generate_mandelbrot(width=800, height=800, max_iter=100, interior_check=True):
     """
     生成Mandelbrot集数据
     :param width: 图像宽度(像素)
     :param height: 图像高度(像素) 
     :param max_iter: 最大迭代次数
+    :param interior_check: 为True时主心形区和周期2圆盘内的点直接记为 max_iter，
+        其余点迭代时做周期检测，集合内部的点不必迭代满 max_iter 次
     :return: 2D numpy数组，包含每个点的逃逸时间
     """
     # 创建x(-2.0到1.0)和y(-1.5到1.5)的线性空间
@@ -17,15 +91,14 @@ def generate_mandelbrot(width=800, height=800, max_iter=100):
     X, Y = np.meshgrid(x, y)
     C = X + 1j * Y
     
-    # 初始化记录数组
-    B = np.zeros(C.shape, dtype=np.int32)  # 记录迭代次数
-    Z = np.zeros(C.shape, dtype=np.complex128)  # 初始值设为0
-    
-    # 迭代计算
-    for j in range(max_iter):
-        mask = np.abs(Z) <= 2
-        B += mask
-        Z[mask] = Z[mask]**2 + C[mask]
+    # 从 z=0 开始迭代，记录逃逸时间
+    if interior_check:
+        B = np.full(C.shape, max_iter, dtype=np.int32)
+        outside = ~in_main_components(C)
+        B[outside] = escape_time(np.zeros(np.count_nonzero(outside), dtype=np.complex128), C[outside],
+                                 max_iter, periodicity=True)
+    else:
+        B = escape_time(np.zeros_like(C), C, max_iter)
     
     # 返回转置后的结果
     return B.T
@@ -47,15 +120,8 @@ def generate_julia(c, width=800, height=800, max_iter=100):
     X, Y = np.meshgrid(x, y)
     Z0 = X + 1j * Y
     
-    # 初始化记录数组
-    B = np.zeros(Z0.shape, dtype=np.int32)  # 记录迭代次数
-    Z = Z0.copy()  # 初始值为网格点
-    
-    # 迭代计算
-    for j in range(max_iter):
-        mask = np.abs(Z) <= 2
-        B += mask
-        Z[mask] = Z[mask]**2 + c
+    # 从网格点开始迭代，记录逃逸时间
+    B = escape_time(Z0, c, max_iter)
     
     # 返回转置后的结果
     return B.T
@@ -9,6 +9,7 @@ sys.path.append(str(Path(__file__).parent.parent))
 
 # 尝试导入学生代码，失败时导入参考解决方案
 from mandelbrot_julia import generate_mandelbrot, generate_julia
+from mandelbrot_julia import escape_time, in_main_components
 #from solution.mandelbrot_julia_solution import generate_mandelbrot, generate_julia
 
 class TestFractals(unittest.TestCase):
@@ -52,5 +53,22 @@ class TestFractals(unittest.TestCase):
         # 至少有一个点应该快速逃逸
         self.assertTrue(np.any(result < 10))
 
+    def test_escape_time(self):
+        """测试逃逸时间的计数方式"""
+        # c=0 时 |z0|>2 立即逃逸，|z0|<=1 永不逃逸，1.5 -> 2.25 第1步后逃逸
+        result = escape_time(np.array([0, 3, 1.5, 1j]), 0, max_iter=10)
+        np.testing.assert_array_equal(result, [10, 0, 1, 10])
+        # Mandelbrot: c=1 时 0,1,2,5，c=-2 时 0,-2,2,2,... 恰在边界上
+        result = escape_time(np.zeros(2), np.array([1, -2]), max_iter=10)
+        np.testing.assert_array_equal(result, [3, 10])
+
+    def test_mandelbrot_interior_check(self):
+        """测试内部判定和周期检测不改变结果"""
+        c = np.array([0, -1, 0.25, -0.75 + 0.1j, 0.3, -1.3, -0.1 + 0.8j])
+        np.testing.assert_array_equal(in_main_components(c), [True, True, True, False, False, False, False])
+        fast = generate_mandelbrot(width=120, height=90, max_iter=300)
+        slow = generate_mandelbrot(width=120, height=90, max_iter=300, interior_check=False)
+        np.testing.assert_array_equal(fast, slow)
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file